@@ -0,0 +1,74 @@
+"""add catalog and orders indexes
+
+Revision ID: 4f2c8e1d9a7b
+Revises: 1a360e5ca022
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2c8e1d9a7b'
+down_revision: Union[str, Sequence[str], None] = '1a360e5ca022'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY нельзя внутри транзакции — orders живая таблица, не блокируем запись
+    with op.get_context().autocommit_block():
+        # загрузка снимка каталога: WHERE is_active ORDER BY created_at DESC, id DESC
+        op.create_index(
+            'ix_designs_active_created', 'designs',
+            [sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True,
+        )
+        # фильтр каталога по категории/бренду
+        op.create_index(
+            'ix_designs_active_cat_brand_created', 'designs',
+            ['category', 'brand', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True,
+        )
+        # админка: список всех дизайнов
+        op.create_index(
+            'ix_designs_created_id', 'designs',
+            [sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+        # админка: keyset по (order_date, id) в обе стороны
+        op.create_index(
+            'ix_orders_order_date_id', 'orders',
+            ['order_date', 'id'],
+            postgresql_concurrently=True,
+        )
+        # веса featured-дизайнов: ready-заказы за последние N дней
+        op.create_index(
+            'ix_orders_ready_date_design', 'orders',
+            ['order_date', 'design_id'],
+            postgresql_where=sa.text("order_kind = 'ready' AND design_id IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+        # FK orders.design_id ON DELETE SET NULL — удаление дизайна без seq scan по orders
+        op.create_index(
+            'ix_orders_design_id', 'orders',
+            ['design_id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_design_id', table_name='orders', postgresql_concurrently=True)
+        op.drop_index('ix_orders_ready_date_design', table_name='orders', postgresql_concurrently=True)
+        op.drop_index('ix_orders_order_date_id', table_name='orders', postgresql_concurrently=True)
+        op.drop_index('ix_designs_created_id', table_name='designs', postgresql_concurrently=True)
+        op.drop_index('ix_designs_active_cat_brand_created', table_name='designs', postgresql_concurrently=True)
+        op.drop_index('ix_designs_active_created', table_name='designs', postgresql_concurrently=True)
@@ -0,0 +1,34 @@
+"""add tg_file_ids table
+
+Revision ID: 9d1a6c3e5b27
+Revises: 7b3e5d2a9c10
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d1a6c3e5b27'
+down_revision: Union[str, Sequence[str], None] = '7b3e5d2a9c10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tg_file_ids',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('file_id', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('sha256', 'kind')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('tg_file_ids')
@@ -0,0 +1,28 @@
+"""add outbox progress
+
+Revision ID: a6c1e9f4d2b7
+Revises: f3a9d2c6b8e1
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c1e9f4d2b7'
+down_revision: Union[str, Sequence[str], None] = 'f3a9d2c6b8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('outbox', sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('outbox', 'progress')
@@ -0,0 +1,34 @@
+"""drop blobs.refcount
+
+Revision ID: b8d4f2a7c3e5
+Revises: a6c1e9f4d2b7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f2a7c3e5'
+down_revision: Union[str, Sequence[str], None] = 'a6c1e9f4d2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # блобы без ссылок находит сборщик (app/core/blobs.py) по order_files, счётчик не нужен
+    op.drop_column('blobs', 'refcount')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('blobs', sa.Column('refcount', sa.Integer(), server_default='0', nullable=False))
+    op.execute(sa.text("""
+        UPDATE blobs b SET refcount = (
+            SELECT count(*) FROM order_files f WHERE f.blob_key = b.key OR f.preview_key = b.key
+        )
+    """))
@@ -0,0 +1,49 @@
+"""add blobs and order_files tables
+
+Revision ID: c2e8f4a1b6d3
+Revises: 9d1a6c3e5b27
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e8f4a1b6d3'
+down_revision: Union[str, Sequence[str], None] = '9d1a6c3e5b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blobs',
+    sa.Column('key', sa.String(length=80), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('order_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('blob_key', sa.String(length=80), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('position', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['blob_key'], ['blobs.key']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_files_order_id', 'order_files', ['order_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_files_order_id', table_name='order_files')
+    op.drop_table('order_files')
+    op.drop_table('blobs')
@@ -0,0 +1,30 @@
+"""add order_files.preview_key
+
+Revision ID: d7a3b9e2c4f1
+Revises: c2e8f4a1b6d3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3b9e2c4f1'
+down_revision: Union[str, Sequence[str], None] = 'c2e8f4a1b6d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('order_files', sa.Column('preview_key', sa.String(length=80), nullable=True))
+    op.create_foreign_key('order_files_preview_key_fkey', 'order_files', 'blobs', ['preview_key'], ['key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('order_files_preview_key_fkey', 'order_files', type_='foreignkey')
+    op.drop_column('order_files', 'preview_key')
@@ -0,0 +1,33 @@
+"""add archived_files table
+
+Revision ID: e4b8c1f7a2d9
+Revises: d7a3b9e2c4f1
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8c1f7a2d9'
+down_revision: Union[str, Sequence[str], None] = 'd7a3b9e2c4f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('archived_files',
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('bundle', sa.String(length=64), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('path')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('archived_files')
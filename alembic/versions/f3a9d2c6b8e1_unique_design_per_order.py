@@ -0,0 +1,49 @@
+"""unique design file per order
+
+Revision ID: f3a9d2c6b8e1
+Revises: e4b8c1f7a2d9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d2c6b8e1'
+down_revision: Union[str, Sequence[str], None] = 'e4b8c1f7a2d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # дубли design от параллельной растеризации сцены: оставляем первый, refcount блобов — вниз
+    op.execute(sa.text("""
+        WITH dup AS (
+            DELETE FROM order_files f
+            WHERE f.role = 'design'
+              AND f.id > (SELECT min(g.id) FROM order_files g WHERE g.order_id = f.order_id AND g.role = 'design')
+            RETURNING f.blob_key, f.preview_key
+        ), keys AS (
+            SELECT blob_key AS key FROM dup
+            UNION ALL
+            SELECT preview_key FROM dup WHERE preview_key IS NOT NULL
+        )
+        UPDATE blobs b SET refcount = b.refcount - k.n
+        FROM (SELECT key, count(*) AS n FROM keys GROUP BY key) k
+        WHERE b.key = k.key
+    """))
+    op.create_index(
+        'ux_order_files_design', 'order_files',
+        ['order_id'],
+        unique=True,
+        postgresql_where=sa.text("role = 'design'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_order_files_design', table_name='order_files')
@@ -1,20 +1,26 @@
 from __future__ import annotations
 
+import logging
 import os
-from math import ceil
+import time
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 
-from sqlalchemy import func, select
+from sqlalchemy import func, select, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # поменяй импорты под свои пути:
 from app.db.database import get_async_session  # должна возвращать AsyncSession
-from app.db.database import Order, Designs  # твоя модель Order
+from app.db.database import Order, Designs, Outbox, OrderFile  # твоя модель Order
 from app.core.render import render
+from app.core.catalog import refresh_catalog
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.tg_scheduler import tg_scheduler
+from app.core.intake import intake_stats
+from app.core.blobs import blob_url
+from app.core.scene import render_order_design
 
 from app.core.limiter import limiter
 
@@ -29,6 +35,14 @@ def _admin_password() -> str:
     return pw
 
 
+async def _refresh_catalog(session: AsyncSession) -> None:
+    # запись уже в БД: снимок не пересобрался — не 500, витрина догонит сама через CATALOG_TTL
+    try:
+        await refresh_catalog(session)
+    except Exception as e:
+        logging.error(f"Catalog refresh after admin write failed: {e}")
+
+
 def require_admin(request: Request) -> None:
     if request.session.get("is_admin") is True:
         return
@@ -59,35 +73,100 @@ async def admin_logout(request: Request):
     return RedirectResponse(url="/admin", status_code=303)
 
 
+# приблизительный total для списка заказов: не считаем count(*) на каждый запрос
+ORDERS_TOTAL_TTL = 60
+# на маленькой таблице reltuples врёт сильнее всего, а точный count там дешёвый
+ORDERS_EXACT_COUNT_BELOW = 10_000
+
+_orders_total: tuple[float, int, bool] | None = None  # (loaded_at, total, is_exact)
+
+
+async def _get_orders_total(session: AsyncSession) -> tuple[int, bool]:
+    global _orders_total
+    now = time.monotonic()
+    if _orders_total and now - _orders_total[0] < ORDERS_TOTAL_TTL:
+        return _orders_total[1], _orders_total[2]
+
+    # оценка планировщика из статистики, обновляется autovacuum/ANALYZE
+    est_stmt = text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'orders'::regclass")
+    estimate = (await session.execute(est_stmt)).scalar_one_or_none()
+
+    if estimate is None or estimate < ORDERS_EXACT_COUNT_BELOW:
+        total = (await session.execute(select(func.count(Order.id)))).scalar_one()
+        exact = True
+    else:
+        total = int(estimate)
+        exact = False
+
+    _orders_total = (now, total, exact)
+    return total, exact
+
+
+def orders_list_stmt(after=None, before=None, limit: int = 21):
+    # только колонки списка: без lazy="joined" на design и без лишних полей
+    stmt = select(
+        Order.id,
+        Order.c_name,
+        Order.phone_number,
+        Order.brand,
+        Order.phone_model,
+        Order.status,
+        Order.order_date,
+    )
+    key = tuple_(Order.order_date, Order.id)
+
+    if before:
+        return (
+            stmt.where(key > tuple_(*before))
+            .order_by(Order.order_date.asc(), Order.id.asc())
+            .limit(limit)
+        )
+
+    if after:
+        stmt = stmt.where(key < tuple_(*after))
+    return stmt.order_by(Order.order_date.desc(), Order.id.desc()).limit(limit)
+
+
 @router.get("/orders", include_in_schema=False)
 async def admin_orders(
     request: Request,
-    page: int = 1,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
     session: AsyncSession = Depends(get_async_session),
     _=Depends(require_admin),
 ):
     page_size = 20
-    page = max(page, 1)
-    offset = (page - 1) * page_size
-
-    total_stmt = select(func.count(Order.id))
-    total = (await session.execute(total_stmt)).scalar_one()
-    pages = max(ceil(total / page_size), 1)
-
-    orders_stmt = (
-        select(Order)
-        .order_by(Order.order_date.desc(), Order.id.desc())
-        .offset(offset)
-        .limit(page_size)
-    )
-    orders = (await session.execute(orders_stmt)).scalars().all()
+
+    try:
+        after_key = decode_cursor(after)
+        before_key = decode_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    total, total_exact = await _get_orders_total(session)
+
+    if before_key:
+        # назад: берём ближайшие более новые записи и разворачиваем
+        rows = (await session.execute(orders_list_stmt(before=before_key, limit=page_size + 1))).all()
+        has_prev = len(rows) > page_size
+        orders = list(reversed(rows[:page_size]))
+        has_next = True
+    else:
+        rows = (await session.execute(orders_list_stmt(after=after_key, limit=page_size + 1))).all()
+        has_next = len(rows) > page_size
+        orders = rows[:page_size]
+        has_prev = after_key is not None
+
+    next_cursor = encode_cursor(orders[-1].order_date, orders[-1].id) if orders and has_next else None
+    prev_cursor = encode_cursor(orders[0].order_date, orders[0].id) if orders and has_prev else None
 
     return render(request,"admin/admin_orders.html",
         {
             "orders": orders,
-            "page": page,
-            "pages": pages,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
             "total": total,
+            "total_exact": total_exact,
             "page_size": page_size,
             "active_page": "orders",
         },
@@ -105,13 +184,39 @@ async def admin_order_detail(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    files = (await session.execute(
+        select(OrderFile).where(OrderFile.order_id == order_id).order_by(OrderFile.position)
+    )).scalars().all()
+
     return render(request,"admin/admin_order_detail.html",
         {
             "order": order,
+            "files": [
+                {
+                    "role": f.role,
+                    "filename": f.filename,
+                    "url": blob_url(f.blob_key),
+                    "preview_url": blob_url(f.preview_key) if f.preview_key else None,
+                }
+                for f in files
+            ],
+            "has_scene": any(f.role == "design_scene" for f in files),
             "active_page": "orders",
         },
     )
 
+@router.get("/orders/{order_id}/design.png", include_in_schema=False)
+async def admin_order_design(
+    order_id: int,
+    _=Depends(require_admin),
+):
+    # заказ со сценой: PNG рисуется при первом просмотре и дальше лежит в хранилище
+    path = await render_order_design(order_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Design not found")
+    return RedirectResponse(url=blob_url(os.path.basename(path)), status_code=303)
+
+
 @router.get("/designs", include_in_schema=False)
 async def admin_designs(
     request: Request,
@@ -189,6 +294,7 @@ async def admin_design_new(
 
     session.add(d)
     await session.commit()
+    await _refresh_catalog(session)
 
     return RedirectResponse(url="/admin/designs", status_code=303)
 
@@ -260,6 +366,7 @@ async def admin_design_edit(
     design.is_active = is_active
 
     await session.commit()
+    await _refresh_catalog(session)
     return RedirectResponse(url="/admin/designs", status_code=303)
 
 
@@ -276,5 +383,21 @@ async def admin_design_delete(
 
     await session.delete(design)
     await session.commit()
+    await _refresh_catalog(session)
 
     return RedirectResponse(url="/admin/designs", status_code=303)
+
+
+@router.get("/queue", include_in_schema=False)
+async def admin_queue(
+    session: AsyncSession = Depends(get_async_session),
+    _=Depends(require_admin),
+):
+    # глубина очередей уведомлений: outbox в БД + вызовы, ждущие лимитов Telegram
+    rows = await session.execute(select(Outbox.status, func.count(Outbox.id)).group_by(Outbox.status))
+    return {
+        "outbox": dict(rows.all()),
+        "telegram": tg_scheduler.stats(),
+        # время стадий приёма заказа (с запуска процесса)
+        "intake": intake_stats(),
+    }
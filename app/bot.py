@@ -21,7 +21,20 @@ def escape_html(text: str) -> str:
 # === ОТПРАВКА В TELEGRAM ===
 from typing import List, Optional
 import os
+from pathlib import Path
+from telegram import InputMediaDocument
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
+
+from app.core import tg_files
+from app.core.tg_scheduler import tg_scheduler
+
+# лимит Bot API на один альбом
+MEDIA_GROUP_SIZE = 10
+
+
+def _file_caption(name: str) -> str:
+    return f"<b>Файл:</b> {escape_html(name)}"
 
 
 
@@ -30,7 +43,15 @@ async def send_order_to_telegram(
     data: dict,
     design_path: Optional[str] = None,
     file_paths: Optional[List[str]] = None,
+    file_names: Optional[List[str]] = None,
+    steps=None,
+    note: Optional[str] = None,
 ):
+    """
+    steps (OutboxSteps) — что уже ушло в прошлых попытках: карточка с фото ("message")
+    и альбомы ("album:k"). Повтор из outbox шлёт только недошедшее.
+    note — строка в конец карточки (например, почему нет дизайна).
+    """
     if file_paths is None:
         file_paths = []
 
@@ -82,53 +103,118 @@ async def send_order_to_telegram(
         if data.get("comment"):
             text += f"<b>Комментарий:</b> {escape_html(data.get('comment'))}\n"
 
+    if note:
+        text += f"\n{escape_html(note)}\n"
+
     # ================= DESIGN PHOTO =================
+    if not (steps and steps.done("message")):
+        await _send_card(text, design_path)
+        if steps:
+            await steps.mark("message")
+
+    # ================= EXTRA FILES (ONLY CUSTOM) =================
+    # альбомами до 10 документов: один вызов вместо десяти
+    # файлы лежат в хранилище под хэшем — подписываем исходными именами
+    names = file_names or [os.path.basename(p) for p in file_paths]
+    documents = [(Path(p), name) for p, name in zip(file_paths, names) if p and os.path.exists(p)]
+    for i in range(0, len(documents), MEDIA_GROUP_SIZE):
+        step = f"album:{i // MEDIA_GROUP_SIZE}"
+        if steps and steps.done(step):
+            continue
+        try:
+            await _send_documents(documents[i:i + MEDIA_GROUP_SIZE])
+        except BadRequest as e:
+            logging.error(f"Telegram document send error: {e}")
+        if steps:
+            await steps.mark(step)
+
+
+async def _send_card(text: str, design_path: Optional[str]) -> None:
     photo_sent = False
 
     if design_path:
         try:
-            # URL → Telegram сам загрузит
+            # URL → Telegram сам загрузит; локальный файл — через кэш file_id
             if design_path.startswith("http"):
-                await bot.send_photo(
-                    chat_id=TELEGRAM_CHAT_ID,
+                await tg_scheduler.call(
+                    TELEGRAM_CHAT_ID,
+                    bot.send_photo,
                     photo=design_path,
                     caption=text,
                     parse_mode=ParseMode.HTML,
                 )
                 photo_sent = True
-
-            # Local file
             elif os.path.exists(design_path):
-                with open(design_path, "rb") as photo:
-                    await bot.send_photo(
-                        chat_id=TELEGRAM_CHAT_ID,
-                        photo=photo,
-                        caption=text,
-                        parse_mode=ParseMode.HTML,
-                    )
+                await _send_cached_photo(Path(design_path), caption=text, parse_mode=ParseMode.HTML)
                 photo_sent = True
 
-        except Exception as e:
+        except BadRequest as e:
+            # картинку Telegram не принял — повтор не поможет, уйдёт текстом.
+            # Сеть/таймауты/RetryAfter летят в outbox: он повторит с задержкой
             logging.error(f"Telegram photo send error: {e}")
 
     # если фото не отправилось — просто текст
     if not photo_sent:
-        await bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
+        await tg_scheduler.call(
+            TELEGRAM_CHAT_ID,
+            bot.send_message,
             text=text + "\n⚠️ Дизайн без изображения",
             parse_mode=ParseMode.HTML,
         )
 
-    # ================= EXTRA FILES (ONLY CUSTOM) =================
-    for path in file_paths:
-        if path and os.path.exists(path):
-            try:
-                with open(path, "rb") as f:
-                    await bot.send_document(
-                        chat_id=TELEGRAM_CHAT_ID,
-                        document=f,
-                        caption=f"<b>Файл:</b> {escape_html(os.path.basename(path))}",
-                        parse_mode=ParseMode.HTML,
-                    )
-            except Exception as e:
-                logging.error(f"Telegram document send error: {e}")
+
+async def _send_cached_photo(path: Path, **kwargs):
+    digest = await tg_files.file_digest(path)
+    file_id = await tg_files.lookup(digest, "photo")
+    if file_id:
+        try:
+            return await tg_scheduler.call(TELEGRAM_CHAT_ID, bot.send_photo, photo=file_id, **kwargs)
+        except BadRequest as e:
+            # file_id протух (другой бот/токен) — забываем и заливаем заново
+            logging.warning(f"Cached photo file_id rejected: {e}")
+            await tg_files.forget(digest, "photo")
+
+    message = await tg_scheduler.call(TELEGRAM_CHAT_ID, bot.send_photo, photo=path, **kwargs)
+    await tg_files.remember(digest, "photo", message.photo[-1].file_id)
+    return message
+
+
+async def _send_documents(documents: List[tuple[Path, str]]) -> None:
+    paths = [path for path, _ in documents]
+    names = [name for _, name in documents]
+    digests = [await tg_files.file_digest(p) for p in paths]
+    cached = [await tg_files.lookup(d, "document") for d in digests]
+
+    async def send(sources) -> list:
+        if len(sources) == 1:
+            # sendMediaGroup требует минимум 2 элемента
+            message = await tg_scheduler.call(
+                TELEGRAM_CHAT_ID,
+                bot.send_document,
+                document=sources[0],
+                filename=names[0],
+                caption=_file_caption(names[0]),
+                parse_mode=ParseMode.HTML,
+            )
+            return [message]
+        media = [
+            InputMediaDocument(media=src, filename=name, caption=_file_caption(name), parse_mode=ParseMode.HTML)
+            for src, name in zip(sources, names)
+        ]
+        return list(await tg_scheduler.call(TELEGRAM_CHAT_ID, bot.send_media_group, media=media, cost=len(media)))
+
+    try:
+        messages = await send([file_id or path for file_id, path in zip(cached, paths)])
+    except BadRequest as e:
+        if not any(cached):
+            raise
+        logging.warning(f"Cached document file_id rejected: {e}")
+        for digest, file_id in zip(digests, cached):
+            if file_id:
+                await tg_files.forget(digest, "document")
+        cached = [None] * len(paths)
+        messages = await send(paths)
+
+    for digest, file_id, message in zip(digests, cached, messages):
+        if not file_id and message.document:
+            await tg_files.remember(digest, "document", message.document.file_id)
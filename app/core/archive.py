@@ -0,0 +1,288 @@
+# app/core/archive.py
+#
+# Архив старых загрузок: файлы заказов старше ARCHIVE_AFTER_DAYS пакуются в бандлы
+# (ARCHIVE_DIR/<имя>.zst), исходники удаляются. /uploads продолжает их отдавать:
+# ArchiveStaticFiles на промахе ищет путь в archived_files и читает один кадр из бандла.
+#
+# Формат бандла — обычный .zst (zstd -d его распакует):
+#   [кадр файла 1][кадр файла 2]...[skippable: JSON-индекс][skippable: смещение индекса]
+# Каждый файл — отдельный zstd-кадр, индекс {путь: [offset, длина кадра, размер]} лежит
+# в самом бандле: для чтения одного файла нужен один pread, бэкап бандлов — последовательное чтение.
+#
+# Руками: python -m app.core.archive [дней]
+import asyncio
+import fcntl
+import json
+import logging
+import mimetypes
+import os
+import struct
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import anyio
+import zstandard
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import select, union
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+
+from app.core.blobs import BLOB_URL_PREFIX, blob_url
+from app.db.database import SessionLocal, ArchivedFile, Blob, Order, OrderFile
+
+UPLOAD_ROOT = Path(os.getenv("UPLOAD_ROOT", "uploads"))
+# вне uploads/: бандлы целиком наружу не отдаются
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive/uploads"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BUNDLE_MAX_BYTES = int(os.getenv("ARCHIVE_BUNDLE_MAX_BYTES", str(512 * 1024 * 1024)))
+ARCHIVE_ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "10"))
+ARCHIVE_INTERVAL = 24 * 3600
+
+# пути в архиве — как в URL под /uploads
+_BLOB_PREFIX = BLOB_URL_PREFIX.removeprefix("/uploads/").strip("/")  # "blobs"
+
+# skippable-кадры zstd (0x184D2A50..5F) декодеры пропускают
+_INDEX_MAGIC = 0x184D2A5A
+_FOOTER_MAGIC = 0x184D2A5B
+_FOOTER = struct.Struct("<IIQ")
+
+
+# ---------------- запись ----------------
+
+def _write_bundle(paths: list[str], name: str) -> dict[str, tuple[int, float]]:
+    """Пакует файлы (пути относительно UPLOAD_ROOT). Возвращает {путь: (размер, mtime)} упакованных."""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    final = ARCHIVE_DIR / name
+    tmp = final.with_suffix(".tmp")
+    cctx = zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL, write_checksum=True)
+    index = {}
+    packed = {}
+    with open(tmp, "wb") as out:
+        for rel in paths:
+            src = UPLOAD_ROOT / rel
+            try:
+                st = src.stat()
+                data = src.read_bytes()
+            except FileNotFoundError:
+                continue
+            frame = cctx.compress(data)
+            index[rel] = [out.tell(), len(frame), len(data)]
+            packed[rel] = (len(data), st.st_mtime)
+            out.write(frame)
+        raw = json.dumps(index, separators=(",", ":")).encode()
+        index_offset = out.tell()
+        out.write(struct.pack("<II", _INDEX_MAGIC, len(raw)) + raw)
+        out.write(_FOOTER.pack(_FOOTER_MAGIC, 8, index_offset))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, final)
+    return packed
+
+
+def _remove_packed(packed: dict[str, tuple[int, float]]) -> int:
+    removed = 0
+    dirs = set()
+    for rel, (size, mtime) in packed.items():
+        src = UPLOAD_ROOT / rel
+        try:
+            st = src.stat()
+            # mtime сдвинулся — файл снова понадобился (persist_file трогает существующий блоб)
+            if st.st_size != size or st.st_mtime != mtime:
+                continue
+            src.unlink()
+            removed += 1
+        except FileNotFoundError:
+            continue
+        if not rel.startswith(_BLOB_PREFIX + "/"):
+            dirs.add(src.parent)
+    # пустые папки старых заказов; шарды blobs/ab/cd оставляем
+    for d in sorted(dirs, key=lambda p: len(p.parts), reverse=True):
+        try:
+            d.rmdir()
+        except OSError:
+            pass
+    return removed
+
+
+# ---------------- выбор кандидатов ----------------
+
+async def _old_blob_paths(session, cutoff: datetime) -> list[str]:
+    # блоб старый, только если на него не ссылается ни один свежий заказ
+    recent = union(
+        select(OrderFile.blob_key).join(Order).where(Order.order_date >= cutoff),
+        select(OrderFile.preview_key).join(Order).where(Order.order_date >= cutoff, OrderFile.preview_key.is_not(None)),
+    ).subquery()
+    keys = (await session.execute(
+        select(Blob.key).where(Blob.created_at < cutoff, Blob.key.not_in(select(recent.c[0])))
+    )).scalars().all()
+    return [blob_url(key).removeprefix("/uploads/") for key in keys]
+
+
+def _legacy_paths(cutoff: float) -> list[str]:
+    # папки заказов до хранилища по содержимому: uploads/<имя>_<дата>/...
+    skip = {_BLOB_PREFIX}
+    paths = []
+    for entry in os.scandir(UPLOAD_ROOT):
+        if not entry.is_dir() or entry.name in skip or entry.name.startswith("."):
+            continue
+        for root, _, files in os.walk(entry.path):
+            for name in files:
+                full = os.path.join(root, name)
+                if os.path.getmtime(full) < cutoff:
+                    paths.append(Path(full).relative_to(UPLOAD_ROOT).as_posix())
+    return paths
+
+
+def _existing(paths: list[str], cutoff: float) -> list[tuple[str, int]]:
+    out = []
+    for rel in paths:
+        try:
+            st = (UPLOAD_ROOT / rel).stat()
+        except FileNotFoundError:
+            continue  # уже в архиве
+        if st.st_mtime < cutoff:
+            out.append((rel, st.st_size))
+    return out
+
+
+def _batches(files: list[tuple[str, int]]) -> list[list[str]]:
+    batches, cur, cur_size = [], [], 0
+    for rel, size in files:
+        if cur and cur_size + size > ARCHIVE_BUNDLE_MAX_BYTES:
+            batches.append(cur)
+            cur, cur_size = [], 0
+        cur.append(rel)
+        cur_size += size
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+# ---------------- компакция ----------------
+
+def _try_lock():
+    # несколько воркеров uvicorn: пакует тот, кто взял lock, остальные пропускают
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    f = open(ARCHIVE_DIR / ".lock", "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+async def compact(days: int = ARCHIVE_AFTER_DAYS) -> dict:
+    lock = await asyncio.to_thread(_try_lock)
+    if lock is None:
+        return {"skipped": "locked"}
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        async with SessionLocal() as session:
+            blob_paths = await _old_blob_paths(session, cutoff)
+        legacy_paths = await asyncio.to_thread(_legacy_paths, cutoff.timestamp())
+        files = await asyncio.to_thread(_existing, blob_paths + legacy_paths, cutoff.timestamp())
+
+        stats = {"bundles": 0, "files": 0, "bytes": 0, "compressed": 0}
+        for batch in _batches(files):
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(4).hex()}.zst"
+            packed = await asyncio.to_thread(_write_bundle, batch, name)
+            if not packed:
+                continue
+            # сначала индекс в БД, потом удаление исходников: файл всегда где-то доступен
+            async with SessionLocal() as session:
+                dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+                for rel in packed:
+                    stmt = dialect.insert(ArchivedFile).values(path=rel, bundle=name)
+                    stmt = stmt.on_conflict_do_update(index_elements=["path"], set_={"bundle": name})
+                    await session.execute(stmt)
+                await session.commit()
+            await asyncio.to_thread(_remove_packed, packed)
+            stats["bundles"] += 1
+            stats["files"] += len(packed)
+            stats["bytes"] += sum(size for size, _ in packed.values())
+            stats["compressed"] += (ARCHIVE_DIR / name).stat().st_size
+        if stats["files"]:
+            logging.info(f"Uploads archive: {stats}")
+        return stats
+    finally:
+        lock.close()
+
+
+async def archive_loop() -> None:
+    while True:
+        try:
+            await compact()
+        except Exception as e:
+            logging.error(f"Uploads archive error: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+# ---------------- чтение ----------------
+
+@lru_cache(maxsize=128)
+def _bundle_index(name: str) -> dict[str, list[int]]:
+    # бандлы неизменяемы — индекс кэшируем навсегда
+    with open(ARCHIVE_DIR / name, "rb") as f:
+        f.seek(-_FOOTER.size, os.SEEK_END)
+        magic, _, index_offset = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic != _FOOTER_MAGIC:
+            raise ValueError(f"{name}: not an uploads bundle")
+        f.seek(index_offset)
+        magic, length = struct.unpack("<II", f.read(8))
+        return json.loads(f.read(length))
+
+
+def read_archived(bundle: str, path: str) -> bytes | None:
+    entry = _bundle_index(bundle).get(path)
+    if entry is None:
+        return None
+    offset, length, size = entry
+    fd = os.open(ARCHIVE_DIR / bundle, os.O_RDONLY)
+    try:
+        frame = os.pread(fd, length, offset)
+    finally:
+        os.close(fd)
+    return zstandard.ZstdDecompressor().decompress(frame, max_output_size=size)
+
+
+async def lookup_archived(path: str) -> bytes | None:
+    async with SessionLocal() as session:
+        bundle = await session.scalar(select(ArchivedFile.bundle).where(ArchivedFile.path == path))
+    if bundle is None:
+        return None
+    return await anyio.to_thread.run_sync(read_archived, bundle, path)
+
+
+class ArchiveStaticFiles(StaticFiles):
+    """StaticFiles для /uploads: файла на диске нет — ищем его в архиве."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404 or scope["method"] not in ("GET", "HEAD"):
+                raise
+        rel = path.replace(os.sep, "/")
+        data = await lookup_archived(rel)
+        if data is None:
+            raise HTTPException(status_code=404)
+        immutable = rel.startswith(_BLOB_PREFIX + "/")
+        return Response(
+            data if scope["method"] == "GET" else b"",
+            media_type=mimetypes.guess_type(rel)[0] or "application/octet-stream",
+            headers={
+                "Content-Length": str(len(data)),
+                # блоб адресован содержимым — не меняется никогда
+                "Cache-Control": "public, max-age=31536000, immutable" if immutable else "public, max-age=86400",
+            },
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(compact(int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS)))
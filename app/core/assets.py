@@ -0,0 +1,220 @@
+# app/core/assets.py
+#
+# Статика с отпечатками: сборка кладёт в app/static/dist копии вида
+# css/output.3f2a1b9c.css (+ .br/.gz для текстовых), и manifest.json
+# "логическое имя -> путь в dist". Такие файлы отдаются с immutable-кэшем.
+#
+#   python -m app.core.assets        # сборка, запускать при деплое
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import stat
+import sys
+from pathlib import Path
+
+import anyio
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # br — опционально, gzip есть всегда
+    brotli = None
+
+STATIC_DIR = Path("app/static")
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+STATIC_PREFIX = "/static/"
+
+# эти картинки адресуются из БД / JS по исходным путям — их не трогаем
+SKIP_DIRS = ("dist/", "assets/designs/", "assets/phone-mocks/", "assets/termos-mocks/")
+COMPRESS_SUFFIXES = {".css", ".js", ".svg", ".json", ".html", ".txt"}
+# сжатие не окупается на крошечных файлах
+COMPRESS_MIN_BYTES = 512
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# import ... from "./x.js" / import "./x.js" / import("./x.js")
+_JS_IMPORT_RE = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(["'])(\.{1,2}/[^"']+?\.js)\2""")
+
+
+def _hashed_name(rel: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    p = Path(rel)
+    return str(p.with_name(f"{p.stem}.{digest}{p.suffix}")).replace(os.sep, "/")
+
+
+def _js_deps(rel: str, data: bytes) -> list[str]:
+    base = Path(rel).parent
+    deps = []
+    for m in _JS_IMPORT_RE.finditer(data.decode("utf-8")):
+        dep = os.path.normpath(base / m.group(3)).replace(os.sep, "/")
+        deps.append(dep)
+    return deps
+
+
+def _rewrite_js(rel: str, data: bytes, manifest: dict[str, str]) -> bytes:
+    base = Path(rel).parent
+
+    def repl(m: re.Match) -> str:
+        dep = os.path.normpath(base / m.group(3)).replace(os.sep, "/")
+        target = manifest.get(dep)
+        if not target:
+            return m.group(0)
+        # в dist структура каталогов та же, что в static
+        new_rel = os.path.relpath(target, os.path.join("dist", os.path.dirname(rel))).replace(os.sep, "/")
+        if not new_rel.startswith("."):
+            new_rel = "./" + new_rel
+        return f"{m.group(1)}{m.group(2)}{new_rel}{m.group(2)}"
+
+    return _JS_IMPORT_RE.sub(repl, data.decode("utf-8")).encode("utf-8")
+
+
+def _write_variants(dst: Path, data: bytes) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.write_bytes(data)
+    if dst.suffix not in COMPRESS_SUFFIXES or len(data) < COMPRESS_MIN_BYTES:
+        return
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        dst.with_name(dst.name + ".gz").write_bytes(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            dst.with_name(dst.name + ".br").write_bytes(br)
+
+
+def build(static_dir: Path = STATIC_DIR, dist_dir: Path = DIST_DIR) -> dict[str, str]:
+    files: dict[str, bytes] = {}
+    for path in sorted(static_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        rel = path.relative_to(static_dir).as_posix()
+        if rel.startswith(SKIP_DIRS):
+            continue
+        files[rel] = path.read_bytes()
+
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+
+    manifest: dict[str, str] = {}
+    outputs: dict[str, bytes] = {}
+
+    # JS-модули ссылаются друг на друга, поэтому хэшируем в порядке зависимостей:
+    # отпечаток модуля считается уже от переписанных импортов
+    visiting: set[str] = set()
+
+    def visit(rel: str) -> None:
+        if rel in manifest:
+            return
+        if rel in visiting:
+            raise RuntimeError(f"Circular JS import involving {rel}")
+        visiting.add(rel)
+
+        data = files[rel]
+        if rel.endswith(".js"):
+            for dep in _js_deps(rel, data):
+                if dep in files:
+                    visit(dep)
+            data = _rewrite_js(rel, data, manifest)
+
+        manifest[rel] = "dist/" + _hashed_name(rel, data)
+        outputs[rel] = data
+        visiting.discard(rel)
+
+    for rel in files:
+        visit(rel)
+
+    for rel, data in outputs.items():
+        _write_variants(static_dir / manifest[rel], data)
+
+    (dist_dir / "manifest.json").write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    return manifest
+
+
+_manifest: dict[str, str] | None = None
+
+
+def load_manifest() -> dict[str, str]:
+    global _manifest
+    try:
+        _manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        logging.warning("Static manifest not found, serving unfingerprinted assets (run: python -m app.core.assets)")
+        _manifest = {}
+    return _manifest
+
+
+def static_url(name: str) -> str:
+    """Логическое имя ('css/output.css') -> URL с отпечатком; без сборки — обычный /static/."""
+    manifest = _manifest if _manifest is not None else load_manifest()
+    return STATIC_PREFIX + manifest.get(name, name)
+
+
+def accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, *params = part.strip().split(";")
+        if name.strip().lower() != coding:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles + отдача готовых .br/.gz по Accept-Encoding и immutable для dist/.
+    Range-запросы обрабатывает сам FileResponse.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = None
+        immutable = path.startswith("dist/")
+
+        if immutable and scope["method"] in ("GET", "HEAD"):
+            request_headers = Headers(scope=scope)
+            accept = request_headers.get("accept-encoding", "")
+            for coding, ext in (("br", ".br"), ("gzip", ".gz")):
+                if not accepts_encoding(accept, coding):
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + ext)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    response = FileResponse(
+                        full_path,
+                        stat_result=stat_result,
+                        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                        headers={"Content-Encoding": coding},
+                    )
+                    # у каждого кодирования свой ETag, иначе кэш отдаст br клиенту без br
+                    response.headers["ETag"] = response.headers["etag"][:-1] + f'-{coding}"'
+                    if self.is_not_modified(response.headers, request_headers):
+                        response = NotModifiedResponse(response.headers)
+                    break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if immutable and response.status_code in (200, 206, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+if __name__ == "__main__":
+    result = build()
+    print(f"{len(result)} assets -> {DIST_DIR}" + ("" if brotli else " (brotli not installed: gzip only)"))
+    sys.exit(0)
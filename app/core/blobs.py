@@ -0,0 +1,179 @@
+# app/core/blobs.py
+#
+# Хранилище загрузок по содержимому: uploads/blobs/ab/cd/<sha256><ext>.
+# Одинаковые файлы лежат один раз, строка blobs — на каждый файл, order_files ссылаются
+# на неё. Двухуровневый шардинг держит каталоги маленькими даже при миллионах файлов.
+#
+# Удаление — только сборщиком (gc_loop): строки, на которые не ссылается ни один
+# order_files, и файлы без строки (заказ упал на commit, проигравший рендер сцены).
+# Трогаем лишь то, что старше BLOB_GC_GRACE: persist_file освежает mtime блоба,
+# взятого повторно, так что файл, который прямо сейчас уходит в заказ, не удалится.
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import delete, select, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.uploads import StoredPart, persist_upload
+from app.db.database import SessionLocal, ArchivedFile, Blob, OrderFile
+
+BLOB_DIR = Path(os.getenv("BLOB_DIR", "uploads/blobs"))
+BLOB_URL_PREFIX = "/uploads/blobs/"
+BLOB_GC_GRACE = int(os.getenv("BLOB_GC_GRACE", str(24 * 3600)))
+BLOB_GC_INTERVAL = 24 * 3600
+
+# расширение идёт в имя блоба ради Content-Type при отдаче; остальное — .bin
+BLOB_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".heic", ".heif", ".pdf", ".svg", ".json"}
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    sha256: str
+    ext: str
+    size: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.sha256}{self.ext}"
+
+    @property
+    def rel_path(self) -> str:
+        return f"{self.sha256[:2]}/{self.sha256[2:4]}/{self.key}"
+
+    @property
+    def path(self) -> Path:
+        return BLOB_DIR / self.rel_path
+
+    @property
+    def url(self) -> str:
+        return blob_url(self.key)
+
+
+def blob_ext(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext in BLOB_EXTS else ".bin"
+
+
+async def store_part(part: StoredPart, ext: str | None = None) -> BlobRef:
+    """Кладёт разобранную часть multipart в хранилище (хэш уже посчитан при приёме)."""
+    ref = BlobRef(sha256=part.sha256, ext=ext or blob_ext(part.filename), size=part.size)
+    # link/копия в ядре; такой контент уже есть — временная копия просто удаляется
+    await persist_upload(part, str(ref.path))
+    return ref
+
+
+def _insert(session: AsyncSession):
+    dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert
+
+
+def blob_path(key: str) -> Path:
+    return BLOB_DIR / key[:2] / key[2:4] / key
+
+
+def blob_url(key: str) -> str:
+    return f"{BLOB_URL_PREFIX}{key[:2]}/{key[2:4]}/{key}"
+
+
+async def add_order_files(
+    session: AsyncSession,
+    order_id: int,
+    files: list[tuple[str, BlobRef, str, BlobRef | None]],
+) -> None:
+    """files: (role, blob, исходное имя, превью). Пишет строки блобов и манифест — в транзакции заказа."""
+    refs = {}
+    for _, ref, _, preview in files:
+        for r in (ref, preview):
+            if r is not None:
+                refs[r.key] = r
+    insert = _insert(session)
+    for key, ref in refs.items():
+        await session.execute(
+            insert(Blob).values(key=key, sha256=ref.sha256, size=ref.size).on_conflict_do_nothing(index_elements=["key"])
+        )
+
+    session.add_all(
+        OrderFile(
+            order_id=order_id,
+            blob_key=ref.key,
+            preview_key=preview.key if preview else None,
+            role=role,
+            filename=filename[:255],
+            position=i,
+        )
+        for i, (role, ref, filename, preview) in enumerate(files)
+    )
+
+
+# ---------------- сборка мусора ----------------
+
+def _unlink_stale(paths: list[Path], cutoff: float) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            # mtime свежий — блоб снова взяли в заказ, пока мы решали
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _stale_files(cutoff: float) -> list[Path]:
+    if not BLOB_DIR.is_dir():
+        return []
+    return [p for p in BLOB_DIR.glob("*/*/*") if p.is_file() and p.stat().st_mtime < cutoff]
+
+
+async def collect_garbage(grace: int = BLOB_GC_GRACE) -> dict:
+    cutoff = time.time() - grace
+    async with SessionLocal() as session:
+        # строки без ссылок: DELETE держит блокировку строки, а вставку order_files
+        # на удаляемый блоб не пропустит внешний ключ
+        referenced = union(
+            select(OrderFile.blob_key),
+            select(OrderFile.preview_key).where(OrderFile.preview_key.is_not(None)),
+        ).subquery()
+        dead = list((await session.execute(
+            delete(Blob)
+            .where(
+                Blob.created_at < datetime.fromtimestamp(cutoff, timezone.utc),
+                Blob.key.not_in(select(referenced.c[0])),
+            )
+            .returning(Blob.key)
+        )).scalars())
+        if dead:
+            # упакованные в архив блобы /uploads больше не отдаёт (сам бандл не переписываем)
+            await session.execute(delete(ArchivedFile).where(
+                ArchivedFile.path.in_([blob_url(key).removeprefix("/uploads/") for key in dead])
+            ))
+        await session.commit()
+
+        # файлы без строки (и брошенные .tmp от копирования); файлы dead сюда тоже попадут
+        orphans = []
+        candidates = await asyncio.to_thread(_stale_files, cutoff)
+        for i in range(0, len(candidates), 500):
+            chunk = {p.name: p for p in candidates[i:i + 500]}
+            known = set((await session.execute(select(Blob.key).where(Blob.key.in_(chunk)))).scalars())
+            orphans.extend(p for name, p in chunk.items() if name not in known)
+
+    removed = await asyncio.to_thread(_unlink_stale, orphans, cutoff)
+    return {"rows": len(dead), "files": removed}
+
+
+async def gc_loop() -> None:
+    while True:
+        try:
+            stats = await collect_garbage()
+            if stats["rows"] or stats["files"]:
+                logging.info(f"Blob GC: {stats}")
+        except Exception as e:
+            logging.error(f"Blob GC error: {e}")
+        await asyncio.sleep(BLOB_GC_INTERVAL)
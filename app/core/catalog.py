@@ -0,0 +1,206 @@
+# app/core/catalog.py
+#
+# In-memory снимок каталога готовых дизайнов.
+# Таблица designs меняется только через админку, поэтому читаем её целиком
+# один раз, строим индексы и дальше отдаём страницы каталога без походов в БД.
+# Снимок неизменяемый: при обновлении строим новый и атомарно подменяем ссылку.
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import encode_cursor
+from app.db.database import SessionLocal, Designs
+
+# У нас несколько воркеров uvicorn: админка сбрасывает снимок только в своём
+# процессе, остальные подхватят изменения по TTL (фоновое обновление).
+CATALOG_TTL = int(os.getenv("CATALOG_TTL", "60"))
+
+CATALOG_PAGE_SIZE = 24
+CATALOG_MAX_PAGE_SIZE = 96
+
+
+@dataclass(frozen=True, slots=True)
+class DesignItem:
+    id: int
+    category: str
+    brand: str | None
+    title: str
+    slug: str
+    image_url: str
+    price_mdl: int
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    version: int
+    loaded_at: float
+
+    # все активные дизайны, порядок как в каталоге: created_at DESC, id DESC
+    items: tuple[DesignItem, ...]
+
+    by_id: Mapping[int, DesignItem]
+    by_slug: Mapping[str, DesignItem]
+    by_category: Mapping[str, tuple[DesignItem, ...]]
+    by_category_brand: Mapping[tuple[str, str], tuple[DesignItem, ...]]
+
+    categories: tuple[str, ...]
+    brands: Mapping[str, tuple[str, ...]]
+
+    # фасеты для чипов фильтра: сколько дизайнов в категории / в бренде внутри категории
+    category_counts: Mapping[str, int]
+    brand_counts: Mapping[tuple[str, str], int]
+
+    def filter(self, category: str | None = None, brand: str | None = None) -> tuple[DesignItem, ...]:
+        if not category:
+            return self.items
+        if brand:
+            return self.by_category_brand.get((category, brand), ())
+        return self.by_category.get(category, ())
+
+    def page(
+        self,
+        category: str | None = None,
+        brand: str | None = None,
+        cursor: tuple[datetime, int] | None = None,
+        limit: int = CATALOG_PAGE_SIZE,
+    ) -> tuple[tuple[DesignItem, ...], str | None]:
+        """
+        Keyset-страница по (created_at DESC, id DESC): элементы строго после cursor.
+        Возвращает (items, next_cursor); next_cursor=None — дальше пусто.
+        """
+        items = self.filter(category, brand)
+        start = 0
+        if cursor is not None:
+            # список отсортирован по убыванию — бинпоиск по инвертированному ключу
+            start = bisect_right(items, _sort_key(*cursor), key=lambda i: _sort_key(i.created_at, i.id))
+
+        chunk = items[start:start + limit]
+        next_cursor = encode_cursor(chunk[-1].created_at, chunk[-1].id) if start + limit < len(items) else None
+        return chunk, next_cursor
+
+    def brands_for(self, category: str | None) -> tuple[str, ...]:
+        if not category:
+            return ()
+        return self.brands.get(category, ())
+
+
+def _sort_key(created_at: datetime, design_id: int) -> tuple[float, int]:
+    return -created_at.timestamp(), -design_id
+
+
+def _to_item(d: Designs) -> DesignItem:
+    return DesignItem(
+        id=d.id,
+        category=d.category,
+        brand=d.brand,
+        title=d.title,
+        slug=d.slug,
+        image_url=d.image_url,
+        price_mdl=d.price_mdl,
+        created_at=d.created_at,
+    )
+
+
+def build_snapshot(items: Iterable[DesignItem], version: int) -> CatalogSnapshot:
+    ordered = tuple(sorted(items, key=lambda i: (i.created_at, i.id), reverse=True))
+
+    by_category: dict[str, list[DesignItem]] = {}
+    by_category_brand: dict[tuple[str, str], list[DesignItem]] = {}
+    for item in ordered:
+        if not item.category:
+            continue
+        by_category.setdefault(item.category, []).append(item)
+        if item.brand:
+            by_category_brand.setdefault((item.category, item.brand), []).append(item)
+
+    brands: dict[str, set[str]] = {}
+    for category, brand in by_category_brand:
+        brands.setdefault(category, set()).add(brand)
+
+    return CatalogSnapshot(
+        version=version,
+        loaded_at=time.monotonic(),
+        items=ordered,
+        by_id=MappingProxyType({i.id: i for i in ordered}),
+        by_slug=MappingProxyType({i.slug: i for i in ordered}),
+        by_category=MappingProxyType({k: tuple(v) for k, v in by_category.items()}),
+        by_category_brand=MappingProxyType({k: tuple(v) for k, v in by_category_brand.items()}),
+        categories=tuple(sorted(by_category)),
+        brands=MappingProxyType({k: tuple(sorted(v)) for k, v in brands.items()}),
+        category_counts=MappingProxyType({k: len(v) for k, v in by_category.items()}),
+        brand_counts=MappingProxyType({k: len(v) for k, v in by_category_brand.items()}),
+    )
+
+
+_snapshot: CatalogSnapshot | None = None
+_version = 0
+_lock = asyncio.Lock()
+_bg_refresh: asyncio.Task | None = None
+
+
+def catalog_stmt():
+    return (
+        select(Designs)
+        .where(Designs.is_active == True)
+        .order_by(Designs.created_at.desc(), Designs.id.desc())
+    )
+
+
+async def _load_items(session: AsyncSession) -> list[DesignItem]:
+    rows = (await session.execute(catalog_stmt())).scalars().all()
+    return [_to_item(d) for d in rows]
+
+
+async def refresh_catalog(session: AsyncSession | None = None, *, force: bool = True) -> CatalogSnapshot:
+    """
+    Перечитывает designs и подменяет снимок.
+    force=False — если пока ждали лок, кто-то уже обновил снимок, берём его.
+    """
+    global _snapshot, _version
+    seen = _snapshot
+
+    async with _lock:
+        if not force and _snapshot is not None and _snapshot is not seen:
+            return _snapshot
+
+        if session is not None:
+            items = await _load_items(session)
+        else:
+            async with SessionLocal() as s:
+                items = await _load_items(s)
+
+        _version += 1
+        _snapshot = build_snapshot(items, _version)
+        logging.info("Catalog snapshot v%s: %s designs", _version, len(_snapshot.items))
+        return _snapshot
+
+
+async def _refresh_in_background() -> None:
+    try:
+        await refresh_catalog(force=False)
+    except Exception as e:
+        # старый снимок остаётся в работе, попробуем на следующем запросе
+        logging.error(f"Catalog refresh error: {e}")
+
+
+async def get_catalog() -> CatalogSnapshot:
+    global _bg_refresh
+    snap = _snapshot
+    if snap is None:
+        return await refresh_catalog(force=False)
+
+    # протухший снимок отдаём сразу, а обновляем в фоне (stale-while-revalidate)
+    if time.monotonic() - snap.loaded_at >= CATALOG_TTL and (_bg_refresh is None or _bg_refresh.done()):
+        _bg_refresh = asyncio.create_task(_refresh_in_background())
+
+    return snap
@@ -0,0 +1,141 @@
+# app/core/featured.py
+#
+# Случайные дизайны для главной без ORDER BY random().
+# Держим компактный массив id активных дизайнов (пересобирается при смене версии
+# снимка каталога) и таблицу алиасов Уолкера — каждая выборка O(1), в БД не ходим.
+# Веса опциональны: 1 + число ready-заказов дизайна за последние N дней.
+import asyncio
+import logging
+import os
+import random
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.core.catalog import CatalogSnapshot, DesignItem, get_catalog
+from app.db.database import SessionLocal, Order
+
+# 0 — без весов, равномерная выборка
+FEATURED_WEIGHT_DAYS = int(os.getenv("FEATURED_WEIGHT_DAYS", "0"))
+FEATURED_WEIGHTS_TTL = int(os.getenv("FEATURED_WEIGHTS_TTL", "600"))
+
+
+class FeaturedSampler:
+    def __init__(self, ids: list[int], weights: dict[int, float] | None = None):
+        self.ids = array("i", ids)
+        self._prob: array | None = None
+        self._alias: array | None = None
+        if weights and ids:
+            self._build_alias([max(weights.get(i, 1.0), 0.0) for i in ids])
+
+    def _build_alias(self, w: list[float]) -> None:
+        n = len(w)
+        total = sum(w)
+        if total <= 0:
+            return
+
+        scaled = [x * n / total for x in w]
+        prob = array("d", [0.0] * n)
+        alias = array("i", [0] * n)
+        small = [i for i, x in enumerate(scaled) if x < 1.0]
+        large = [i for i, x in enumerate(scaled) if x >= 1.0]
+
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            prob[i] = 1.0
+
+        self._prob, self._alias = prob, alias
+
+    def _draw_index(self) -> int:
+        n = len(self.ids)
+        i = random.randrange(n)
+        if self._prob is None or random.random() < self._prob[i]:
+            return i
+        return self._alias[i]
+
+    def sample(self, k: int) -> list[int]:
+        n = len(self.ids)
+        if k >= n:
+            picked = list(self.ids)
+            random.shuffle(picked)
+            return picked
+
+        if self._prob is None:
+            return [self.ids[i] for i in random.sample(range(n), k)]
+
+        # без повторов: отбрасываем дубликаты, попыток с запасом
+        seen: dict[int, None] = {}
+        for _ in range(k * 16):
+            seen.setdefault(self._draw_index(), None)
+            if len(seen) == k:
+                break
+        # если веса сильно перекошены — добиваем равномерно
+        while len(seen) < k:
+            seen.setdefault(random.randrange(n), None)
+        return [self.ids[i] for i in seen]
+
+
+_sampler: FeaturedSampler | None = None
+_sampler_key: tuple[int, float] | None = None
+
+_weights: dict[int, float] | None = None
+_weights_loaded_at = 0.0
+_weights_task: asyncio.Task | None = None
+
+
+def featured_weights_stmt(since: datetime):
+    return (
+        select(Order.design_id, func.count(Order.id))
+        .where(
+            Order.order_kind == "ready",
+            Order.design_id.is_not(None),
+            Order.order_date >= since,
+        )
+        .group_by(Order.design_id)
+    )
+
+
+async def _load_weights() -> None:
+    global _weights, _weights_loaded_at
+    stmt = featured_weights_stmt(datetime.now(timezone.utc) - timedelta(days=FEATURED_WEIGHT_DAYS))
+    try:
+        async with SessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+        _weights = {design_id: 1.0 + cnt for design_id, cnt in rows}
+    except Exception as e:
+        logging.error(f"Featured weights load error: {e}")
+    finally:
+        _weights_loaded_at = time.monotonic()
+
+
+def _maybe_refresh_weights() -> None:
+    global _weights_task
+    if FEATURED_WEIGHT_DAYS <= 0:
+        return
+    if time.monotonic() - _weights_loaded_at < FEATURED_WEIGHTS_TTL:
+        return
+    if _weights_task is None or _weights_task.done():
+        _weights_task = asyncio.create_task(_load_weights())
+
+
+def _sampler_for(catalog: CatalogSnapshot) -> FeaturedSampler:
+    global _sampler, _sampler_key
+    key = (catalog.version, _weights_loaded_at)
+    if _sampler is None or _sampler_key != key:
+        _sampler = FeaturedSampler([i.id for i in catalog.items], _weights)
+        _sampler_key = key
+    return _sampler
+
+
+async def get_featured(k: int = 4) -> list[DesignItem]:
+    catalog = await get_catalog()
+    _maybe_refresh_weights()
+    sampler = _sampler_for(catalog)
+    return [catalog.by_id[i] for i in sampler.sample(k)]
@@ -0,0 +1,259 @@
+# app/core/images.py
+#
+# Ресайз картинок каталога на лету: /img/{width}/{format}/{path}?v=<mtime исходника>.
+# Кодирование — в ProcessPoolExecutor (Pillow держит GIL), результат — в дисковый
+# кэш с именем от хэша (содержимое исходника + параметры), размер кэша ограничен.
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+
+STATIC_ROOT = Path("app/static").resolve()
+IMG_CACHE_DIR = Path(os.getenv("IMG_CACHE_DIR", ".cache/img"))
+IMG_CACHE_BYTES = int(os.getenv("IMG_CACHE_BYTES", str(512 * 1024 * 1024)))
+IMG_WORKERS = int(os.getenv("IMG_WORKERS", "2"))
+# как часто перепроверять mtime исходника для ?v= (как и каталог — раз в минуту)
+IMG_VERSION_TTL = int(os.getenv("IMG_VERSION_TTL", "60"))
+
+# фиксированный набор, иначе кэш можно раздуть перебором ширин
+IMG_WIDTHS = (160, 320, 480, 640, 960, 1280)
+IMG_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", "image/avif", {"quality": 55}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+SRCSET_WIDTHS = (320, 480, 640, 960)
+SOURCE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+def _resize_to_file(src: str, dst: str, width: int, fmt: str) -> int:
+    # выполняется в дочернем процессе
+    from PIL import Image, ImageOps
+
+    pil_format, _, save_opts = IMG_FORMATS[fmt]
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            height = max(1, round(im.height * width / im.width))
+            im = im.resize((width, height), Image.Resampling.LANCZOS)
+
+        if pil_format == "JPEG":
+            if im.mode in ("RGBA", "LA", "P"):
+                im = im.convert("RGBA")
+                bg = Image.new("RGB", im.size, (255, 255, 255))
+                bg.paste(im, mask=im.getchannel("A"))
+                im = bg
+            else:
+                im = im.convert("RGB")
+        elif im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA")
+
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        try:
+            im.save(tmp, format=pil_format, **save_opts)
+        except BaseException:
+            # недописанный tmp в кэше никто не подберёт и не посчитает в размере
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+    os.replace(tmp, dst)
+    return os.path.getsize(dst)
+
+
+# один пул процессов на всю работу с Pillow (ресайз каталога, проверка загрузок)
+_pool: ProcessPoolExecutor | None = None
+
+
+def process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # не fork: в процессе uvicorn уже есть потоки (тредпул, драйвер БД), форк с чужими
+        # захваченными локами может навсегда повиснуть; forkserver форкает из чистого процесса
+        _pool = ProcessPoolExecutor(max_workers=IMG_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+
+async def run_in_pool(fn, *args):
+    """
+    fn(*args) в пуле. Воркер убили (OOM) — пул навсегда BrokenProcessPool: выбрасываем его,
+    следующий вызов создаст новый, и один раз повторяем. Второй раз — ошибка этого запроса.
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = process_pool()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            logging.error(f"Process pool is broken ({getattr(fn, '__name__', fn)}), recreating")
+            if _pool is pool:
+                _pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            if attempt:
+                raise
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+@lru_cache(maxsize=4096)
+def _file_sha256(path: str, mtime_ns: int, size: int) -> str:
+    # mtime и размер в ключе: файл заменили — посчитаем заново, старая запись вытеснится
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ImageResizer:
+    def __init__(self, cache_dir: Path = IMG_CACHE_DIR, max_bytes: int = IMG_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._size: int | None = None
+        self._evicting = False
+
+    def shutdown(self) -> None:
+        shutdown_pool()
+
+    @staticmethod
+    def resolve_source(path: str) -> Path | None:
+        src = (STATIC_ROOT / path).resolve()
+        if not src.is_relative_to(STATIC_ROOT) or src.suffix.lower() not in SOURCE_SUFFIXES:
+            return None
+        return src if src.is_file() else None
+
+    def _source_hash(self, src: Path) -> str:
+        st = src.stat()
+        return _file_sha256(str(src), st.st_mtime_ns, st.st_size)
+
+    def _cache_path(self, src: Path, width: int, fmt: str) -> Path:
+        key = hashlib.sha256(f"{self._source_hash(src)}|{width}|{fmt}".encode()).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.{fmt}"
+
+    def _dir_size(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.rglob("*") if p.is_file())
+
+    def _evict(self) -> None:
+        # выкидываем самые давно использованные (по mtime, на хитах его трогаем), до 90% бюджета
+        files = sorted(
+            (p for p in self.cache_dir.rglob("*") if p.is_file()),
+            key=lambda p: p.stat().st_mtime,
+        )
+        size = sum(p.stat().st_size for p in files)
+        target = int(self.max_bytes * 0.9)
+        for p in files:
+            if size <= target:
+                break
+            try:
+                sz = p.stat().st_size
+                p.unlink()
+                size -= sz
+            except FileNotFoundError:
+                pass
+        self._size = size
+
+    async def _account(self, added: int) -> None:
+        if self._size is None:
+            self._size = await asyncio.to_thread(self._dir_size)
+        else:
+            self._size += added
+        if self._size > self.max_bytes and not self._evicting:
+            self._evicting = True
+            try:
+                await asyncio.to_thread(self._evict)
+            finally:
+                self._evicting = False
+
+    async def get(self, path: str, width: int, fmt: str) -> Path | None:
+        """Путь к готовому варианту в кэше; None — исходника нет."""
+        src = self.resolve_source(path)
+        if src is None:
+            return None
+
+        dst = await asyncio.to_thread(self._cache_path, src, width, fmt)
+        if dst.exists():
+            try:
+                os.utime(dst)
+            except OSError:
+                pass
+            return dst
+
+        key = str(dst)
+        fut = self._inflight.get(key)
+        if fut is None:
+            # одинаковые параллельные запросы ждут одну и ту же задачу
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            fut = asyncio.ensure_future(run_in_pool(_resize_to_file, str(src), str(dst), width, fmt))
+            self._inflight[key] = fut
+            try:
+                size = await fut
+            finally:
+                self._inflight.pop(key, None)
+            await self._account(size)
+        else:
+            await fut
+        return dst
+
+
+resizer = ImageResizer()
+
+
+@lru_cache(maxsize=4096)
+def _source_version(path: str, period: int) -> str | None:
+    try:
+        return format((STATIC_ROOT / path).stat().st_mtime_ns, "x")
+    except OSError:
+        return None
+
+
+def source_version(path: str) -> str | None:
+    """
+    Версия исходника для URL (mtime): заменили файл — у вариантов новый адрес.
+    img_url зовётся на каждую картинку при рендере, поэтому stat — не чаще раза в IMG_VERSION_TTL.
+    """
+    return _source_version(path, int(time.monotonic() // IMG_VERSION_TTL))
+
+
+def img_url(url: str, width: int, fmt: str = "webp") -> str:
+    """/static/... -> /img/{width}/{fmt}/...?v=<версия>; внешние URL не трогаем."""
+    if not url or not url.startswith("/static/"):
+        return url
+    path = url[len("/static/"):]
+    version = source_version(path)
+    return f"/img/{width}/{fmt}/{path}" + (f"?v={version}" if version else "")
+
+
+def img_srcset(url: str, widths=SRCSET_WIDTHS, fmt: str = "webp") -> str:
+    if not url or not url.startswith("/static/"):
+        return ""
+    return ", ".join(f"{img_url(url, w, fmt)} {w}w" for w in widths)
+
+
+_supported: dict[str, bool] = {}
+
+
+def format_supported(fmt: str) -> bool:
+    # AVIF есть не в каждой сборке Pillow
+    if fmt not in _supported:
+        try:
+            from PIL import Image
+            Image.init()
+            _supported[fmt] = fmt in IMG_FORMATS and IMG_FORMATS[fmt][0] in Image.SAVE
+        except ImportError:
+            logging.warning("Pillow is not installed: /img endpoint is disabled")
+            _supported[fmt] = False
+    return _supported[fmt]
@@ -0,0 +1,194 @@
+# app/core/intake.py
+#
+# Общий приём заказа для всех товаров (чехлы, термосы, готовые дизайны, ...).
+# Роут описывает только сам товар — OrderDraft (строка Order + карточка для Telegram),
+# остальное делает пайплайн:
+#   parse   — потоковый multipart (+ фото, залитые докачкой);
+#   images  — проверка/нормализация всех картинок разом в пуле процессов
+#             (sha256 и размер считаются при записи результата, см. order_images);
+#   store   — раскладка в хранилище по содержимому, тоже параллельно;
+#   db      — заказ + манифест файлов + outbox одной транзакцией.
+# Параллельность ограничена INTAKE_CONCURRENCY, время стадий — в логе и в /admin/queue.
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from fastapi import HTTPException, Request
+from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.blobs import BlobRef, store_part, add_order_files
+from app.core.order_images import normalize_part
+from app.core.outbox import enqueue, outbox_workers
+from app.core.resumable import claim_uploads, release_uploads
+from app.core.scene import validate_scene, bind_scene, store_scene
+from app.core.uploads import StreamedForm, parse_multipart_stream
+from app.db.database import Order
+
+INTAKE_CONCURRENCY = int(os.getenv("INTAKE_CONCURRENCY", "4"))
+
+T = TypeVar("T")
+
+
+@dataclass
+class OrderDraft:
+    kind: str                   # для логов и статистики: custom, termos, ready, ...
+    order: Order                # ещё без id и design_url
+    data: dict                  # карточка заказа для Telegram
+    message: str = "Order received"
+    design_path: str | None = None  # готовая картинка (заказ из каталога)
+
+
+@dataclass
+class _Stage:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+
+_stats: dict[str, dict[str, _Stage]] = {}
+
+
+class IntakeTimer:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - t
+
+    def done(self) -> None:
+        self.stages["total"] = time.perf_counter() - self.started
+        per_kind = _stats.setdefault(self.kind, {})
+        for name, seconds in self.stages.items():
+            st = per_kind.setdefault(name, _Stage())
+            st.count += 1
+            st.total += seconds
+            st.max = max(st.max, seconds)
+        logging.info(
+            f"Order intake ({self.kind}): "
+            + " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.stages.items())
+        )
+
+
+def intake_stats() -> dict:
+    return {
+        kind: {
+            name: {"count": st.count, "avg_ms": round(st.total / st.count * 1000, 1), "max_ms": round(st.max * 1000, 1)}
+            for name, st in stages.items()
+        }
+        for kind, stages in _stats.items()
+    }
+
+
+async def bounded_gather(coros: Iterable[Awaitable[T]], limit: int = INTAKE_CONCURRENCY) -> list[T]:
+    sem = asyncio.Semaphore(limit)
+
+    async def run(coro: Awaitable[T]) -> T:
+        async with sem:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+async def submit_order(
+    session: AsyncSession,
+    draft: OrderDraft,
+    files: list[tuple[str, BlobRef, str, BlobRef | None]] = (),
+    render: bool = False,
+) -> Order:
+    """Заказ, его файлы и уведомление — одной транзакцией; Telegram шлёт воркер outbox."""
+    order = draft.order
+    attachments = [(ref, name) for role, ref, name, _ in files if role == "attachment"]
+    try:
+        session.add(order)
+        await session.flush()
+        if files:
+            await add_order_files(session, order.id, files)
+        enqueue(session, "telegram_order", {
+            "data": draft.data,
+            "design_path": draft.design_path,
+            # дизайн пришёл сценой — PNG нарисует воркер outbox перед отправкой
+            "render_order_id": order.id if render else None,
+            "file_paths": [str(ref.path) for ref, _ in attachments],
+            "file_names": [name for _, name in attachments],
+        })
+        await session.commit()
+    except (IntegrityError, DataError) as e:
+        logging.error(f"DB Error ({draft.kind}): {e}")
+        raise HTTPException(status_code=400, detail="Ошибка сохранения заказа в БД")
+    outbox_workers.notify()
+    return order
+
+
+async def _intake(form: StreamedForm, session: AsyncSession, draft: OrderDraft, timer: IntakeTimer) -> Order:
+    design_image = form.file("design_image")
+    scene_raw = form.get("design_scene")
+    if design_image is None and not scene_raw:
+        raise HTTPException(status_code=422, detail="design_image or design_scene is required")
+    uploads = [file for file in form.file_list("files") if file.filename]  # Пропуск пустых
+    # сцена вместо готового PNG: проверяем сразу, растеризуем потом, когда понадобится
+    scene = validate_scene(scene_raw, len(uploads)) if design_image is None else None
+
+    with timer.stage("images"):
+        images = await bounded_gather([
+            *(normalize_part(file, "attachment") for file in uploads),
+            *([normalize_part(design_image, "design")] if design_image else []),
+        ])
+
+    with timer.stage("store"):
+        # части и превью — одним списком: [part0, preview0, part1, preview1, ...]
+        refs = await bounded_gather(store_part(p) for img in images for p in (img.part, img.preview))
+    files = [
+        ("attachment", refs[2 * i], img.part.filename, refs[2 * i + 1])
+        for i, img in enumerate(images[:len(uploads)])
+    ]
+    if design_image:
+        design = refs[-2]
+        files.insert(0, ("design", design, "design.png", refs[-1]))
+        draft.order.design_url = design.url
+        draft.design_path = str(design.path)
+    else:
+        with timer.stage("scene"):
+            design = await store_scene(bind_scene(scene, [f[1].key for f in files]), form.tmp_dir)
+        files.insert(0, ("design_scene", design, "design.scene.json", None))
+
+    with timer.stage("db"):
+        return await submit_order(session, draft, files, render=design_image is None)
+
+
+async def receive_order_form(
+    request: Request,
+    session: AsyncSession,
+    build: Callable[[StreamedForm], OrderDraft],
+) -> dict:
+    """
+    Полный приём заказа с дизайном и фото. build(form) собирает из полей формы
+    OrderDraft конкретного товара — больше новому товару ничего не нужно.
+    """
+    timer = IntakeTimer("?")
+    with timer.stage("parse"):
+        # тело разбираем сами: потоково, с лимитами на размер/кол-во файлов (413 до буферизации)
+        form = await parse_multipart_stream(request)
+    try:
+        draft = build(form)
+        timer.kind = draft.kind
+        # фото, уже залитые докачкой (/api/uploads), идут по id
+        upload_ids = await claim_uploads(form)
+        await _intake(form, session, draft, timer)
+    finally:
+        form.cleanup()
+    # заказ записан — исходники докачки больше не нужны (до этого клиент мог повторить)
+    await release_uploads(upload_ids)
+    timer.done()
+    return {"message": draft.message}
@@ -0,0 +1,180 @@
+# app/core/order_images.py
+#
+# Проверка и нормализация картинок заказа (canvas-дизайн + фото клиента).
+# Декодирование — в пуле процессов из app.core.images, event loop не блокируется.
+# Что делаем: проверяем формат и число пикселей (защита от decompression bomb),
+# поворачиваем по EXIF и выкидываем метаданные, уменьшаем до ORDER_IMAGE_MAX_SIDE,
+# перекодируем (дизайн — PNG без потерь для печати, фото — JPEG / PNG при альфе)
+# и делаем маленькое WEBP-превью для админки.
+import hashlib
+import os
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+from app.core.images import run_in_pool
+from app.core.uploads import StoredPart
+
+ORDER_IMAGE_MAX_SIDE = int(os.getenv("ORDER_IMAGE_MAX_SIDE", "4096"))
+# больше — отказ, даже не декодируем
+ORDER_IMAGE_MAX_PIXELS = int(os.getenv("ORDER_IMAGE_MAX_PIXELS", str(80_000_000)))
+PREVIEW_SIDE = 320
+
+ACCEPTED_FORMATS = {"PNG", "JPEG", "WEBP", "GIF", "MPO", "HEIF", "AVIF"}
+
+
+class ImageRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _HashingWriter:
+    """Файл для im.save(): sha256 и размер считаются при записи, без второго чтения."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "wb")
+        self._h = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._h.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+def _save(im, path: str, **params) -> tuple[int, str]:
+    out = _HashingWriter(path)
+    try:
+        im.save(out, **params)
+    finally:
+        out.close()
+    return out.size, out.hexdigest()
+
+
+def _has_alpha(im) -> bool:
+    return im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+
+
+def _normalize(src: str, role: str, max_side: int, max_pixels: int) -> dict:
+    # выполняется в дочернем процессе
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    # свою проверку делаем ниже, до декодирования
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        im = Image.open(src)
+    except (UnidentifiedImageError, OSError):
+        raise ImageRejected(422, "Unsupported image format")
+
+    with im:
+        if im.format not in ACCEPTED_FORMATS:
+            raise ImageRejected(422, f"Unsupported image format: {im.format}")
+        if im.width * im.height > max_pixels:
+            raise ImageRejected(413, f"Image is too large: {im.width}x{im.height}")
+
+        if im.format == "JPEG":
+            # JPEG умеет уменьшаться при декодировании — в разы быстрее и меньше памяти
+            im.draft("RGB", (max_side, max_side))
+        # битые данные Pillow замечает не в open(), а при декодировании (thumbnail/save):
+        # OSError, ValueError, SyntaxError, struct.error — смотря какой плагин
+        try:
+            im = ImageOps.exif_transpose(im)
+            icc_profile = im.info.get("icc_profile")
+            im.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+            if role == "design" or _has_alpha(im):
+                if im.mode not in ("RGB", "RGBA"):
+                    im = im.convert("RGBA" if _has_alpha(im) else "RGB")
+                ext, save = ".png", {"format": "PNG", "compress_level": 6}
+            else:
+                im = im.convert("RGB")
+                ext, save = ".jpg", {"format": "JPEG", "quality": 90, "optimize": True, "progressive": True}
+
+            # EXIF/XMP/текстовые чанки не переносим; цветовой профиль оставляем
+            out = f"{src}.n{ext}"
+            size, sha256 = _save(im, out, icc_profile=icc_profile, **save)
+
+            preview = im.copy()
+            preview.thumbnail((PREVIEW_SIDE, PREVIEW_SIDE), Image.Resampling.LANCZOS)
+            if preview.mode not in ("RGB", "RGBA"):
+                preview = preview.convert("RGBA")
+            preview_out = f"{src}.p.webp"
+            preview_size, preview_sha256 = _save(preview, preview_out, format="WEBP", quality=75, method=4)
+        except Exception:
+            for partial in (f"{src}.n.png", f"{src}.n.jpg", f"{src}.p.webp"):
+                try:
+                    os.unlink(partial)
+                except FileNotFoundError:
+                    pass
+            raise ImageRejected(422, "Corrupted image")
+
+        width, height = im.size
+
+    os.unlink(src)
+    return {
+        "ext": ext,
+        "width": width,
+        "height": height,
+        "path": out,
+        "size": size,
+        "sha256": sha256,
+        "preview_path": preview_out,
+        "preview_size": preview_size,
+        "preview_sha256": preview_sha256,
+    }
+
+
+@dataclass
+class NormalizedImage:
+    part: StoredPart
+    preview: StoredPart
+    width: int
+    height: int
+
+
+async def normalize_part(part: StoredPart, role: str) -> NormalizedImage:
+    """role: design | attachment. Плохая картинка -> HTTPException 422/413."""
+    try:
+        r = await run_in_pool(_normalize, part.path, role, ORDER_IMAGE_MAX_SIDE, ORDER_IMAGE_MAX_PIXELS)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{part.filename}: {e.detail}")
+    except BrokenProcessPool:
+        raise HTTPException(status_code=503, detail="Image processing is unavailable, try again later")
+
+    stem = os.path.splitext(part.filename)[0] or role
+    content_type = "image/png" if r["ext"] == ".png" else "image/jpeg"
+    return NormalizedImage(
+        part=StoredPart(
+            field=part.field,
+            filename=stem + r["ext"],
+            path=r["path"],
+            size=r["size"],
+            content_type=content_type,
+            sha256=r["sha256"],
+        ),
+        preview=StoredPart(
+            field=part.field,
+            filename=f"{stem}.preview.webp",
+            path=r["preview_path"],
+            size=r["preview_size"],
+            content_type="image/webp",
+            sha256=r["preview_sha256"],
+        ),
+        width=r["width"],
+        height=r["height"],
+    )
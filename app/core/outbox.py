@@ -0,0 +1,260 @@
+# app/core/outbox.py
+#
+# Transactional outbox для уведомлений о заказах.
+# Роут пишет строку outbox в той же транзакции, что и Order, и сразу отвечает клиенту.
+# Пул async-воркеров забирает строки по одной (FOR UPDATE SKIP LOCKED — безопасно при нескольких
+# процессах uvicorn), отправляет, при ошибке откладывает с экспоненциальной задержкой,
+# после OUTBOX_MAX_ATTEMPTS — переводит в dead. Пока строка в работе, воркер продлевает
+# аренду (locked_until); итог пишется, только если аренда всё ещё его.
+# Обработчик из нескольких отправок отмечает сделанные шаги (OutboxSteps -> outbox.progress),
+# повтор после ошибки их пропускает.
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.page_cache import SITE_URL
+from app.db.database import SessionLocal, Outbox
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_POLL_SECONDS = 2.0
+OUTBOX_LEASE_SECONDS = 120
+# отправка может долго стоять в очереди tg_scheduler (20 сообщений в минуту на чат)
+OUTBOX_HEARTBEAT_SECONDS = OUTBOX_LEASE_SECONDS / 4
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 30 * 60
+
+def enqueue(session: AsyncSession, kind: str, payload: dict) -> Outbox:
+    """Добавляет сообщение в сессию; коммитит вызывающий код вместе с заказом."""
+    msg = Outbox(kind=kind, payload=payload)
+    session.add(msg)
+    return msg
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class _Lease:
+    """Аренда строки воркером. Пишем в строку только при совпадении locked_until с нашим."""
+
+    def __init__(self, msg_id: int, until: datetime):
+        self.id = msg_id
+        self.until = until
+        # heartbeat и шаги обработчика пишут параллельно: until меняется только под замком
+        self._lock = asyncio.Lock()
+
+    async def update(self, **values) -> bool:
+        async with self._lock:
+            return await self._write(**values)
+
+    async def _write(self, **values) -> bool:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                update(Outbox)
+                .where(Outbox.id == self.id, Outbox.status == "processing", Outbox.locked_until == self.until)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+    async def extend(self) -> bool:
+        async with self._lock:
+            until = datetime.now(timezone.utc) + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            if not await self._write(locked_until=until):
+                return False
+            self.until = until
+            return True
+
+    async def heartbeat(self, stop: asyncio.Event) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=OUTBOX_HEARTBEAT_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if not await self.extend():
+                    logging.warning(f"Outbox #{self.id}: lease lost")
+                    return
+            except Exception as e:
+                logging.error(f"Outbox #{self.id}: lease extend error: {e}")
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+class OutboxSteps:
+    """Шаги обработчика, сделанные в прошлых попытках; mark() сохраняет шаг в строке outbox."""
+
+    def __init__(self, lease: _Lease, done=None):
+        self._lease = lease
+        self._done = set(done or ())
+
+    def done(self, step: str) -> bool:
+        return step in self._done
+
+    async def mark(self, step: str) -> None:
+        self._done.add(step)
+        if not await self._lease.update(progress=sorted(self._done)):
+            # строку уже обрабатывает другой воркер — дальше не шлём
+            raise LeaseLost(f"Outbox #{self._lease.id}: lease lost")
+
+
+Handler = Callable[[dict, OutboxSteps], Awaitable[None]]
+_handlers: dict[str, Handler] = {}
+
+
+def outbox_handler(kind: str):
+    def decorator(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+class OutboxWorkerPool:
+    def __init__(self, workers: int = OUTBOX_WORKERS):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def notify(self) -> None:
+        # новый заказ в этом процессе — не ждём следующего опроса
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        logging.info("Outbox: started %s workers", self.workers)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self):
+        # по одной строке: пачка под общей арендой не успевала уйти до её конца
+        now = datetime.now(timezone.utc)
+        until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        due = or_(
+            and_(Outbox.status == "pending", Outbox.available_at <= now),
+            and_(Outbox.status == "processing", Outbox.locked_until < now),
+        )
+        ids = (
+            select(Outbox.id)
+            .where(due)
+            .order_by(Outbox.available_at, Outbox.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Outbox)
+            .where(Outbox.id.in_(ids))
+            .values(status="processing", locked_until=until, attempts=Outbox.attempts + 1)
+            .returning(Outbox.id, Outbox.kind, Outbox.payload, Outbox.attempts, Outbox.progress)
+            .execution_options(synchronize_session=False)
+        )
+        async with SessionLocal() as session:
+            row = (await session.execute(stmt)).first()
+            await session.commit()
+        return row, (_Lease(row.id, until) if row else None)
+
+    async def _finish(self, lease: _Lease, **values) -> None:
+        if not await lease.update(locked_until=None, **values):
+            # аренда истекла и строку забрал другой воркер — его результат главнее
+            logging.warning(f"Outbox #{lease.id}: lease lost, result {values.get('status')!r} dropped")
+
+    async def _process(self, row, lease: _Lease) -> None:
+        handler = _handlers.get(row.kind)
+        stop = asyncio.Event()
+        heartbeat = asyncio.create_task(lease.heartbeat(stop))
+        error = None
+        try:
+            if handler is None:
+                raise RuntimeError(f"No outbox handler for kind {row.kind!r}")
+            await handler(row.payload, OutboxSteps(lease, row.progress))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            # heartbeat пишет locked_until — дожидаемся его, а не отменяем посреди UPDATE
+            stop.set()
+            await heartbeat
+
+        if error is None:
+            await self._finish(lease, status="done", last_error=None)
+        elif row.attempts >= OUTBOX_MAX_ATTEMPTS or handler is None:
+            logging.error(f"Outbox #{row.id} dead after {row.attempts} attempts: {error}")
+            await self._finish(lease, status="dead", last_error=error)
+        else:
+            delay = backoff_delay(row.attempts)
+            logging.warning(f"Outbox #{row.id} attempt {row.attempts} failed, retry in {delay:.0f}s: {error}")
+            await self._finish(
+                lease,
+                status="pending",
+                last_error=error,
+                available_at=datetime.now(timezone.utc) + timedelta(seconds=delay),
+            )
+
+    async def _run(self, n: int) -> None:
+        while not self._stopping:
+            try:
+                row, lease = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Outbox worker {n}: claim error: {e}")
+                row = None
+
+            if row is not None:
+                await self._process(row, lease)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_workers = OutboxWorkerPool()
+
+
+@outbox_handler("telegram_order")
+async def _send_telegram_order(payload: dict, steps: OutboxSteps) -> None:
+    from app.bot import send_order_to_telegram
+    from app.core.scene import render_order_design
+
+    design_path = payload.get("design_path")
+    note = None
+    order_id = payload.get("render_order_id")
+    if design_path is None and order_id and not steps.done("message"):
+        # дизайн пришёл сценой — PNG рисуется здесь (и кэшируется в заказе).
+        # Не нарисовался — заказ всё равно уходит, дизайн смотрят в админке
+        try:
+            design_path = await render_order_design(order_id)
+        except Exception as e:
+            logging.error(f"Order #{order_id}: scene render failed: {e}")
+            note = f"⚠️ Дизайн не отрисован, открыть в админке: {SITE_URL.rstrip('/')}/admin/orders/{order_id}/design.png"
+
+    await send_order_to_telegram(
+        payload["data"],
+        design_path=design_path,
+        file_paths=payload.get("file_paths") or [],
+        file_names=payload.get("file_names"),
+        steps=steps,
+        note=note,
+    )
@@ -0,0 +1,90 @@
+# app/core/page_cache.py
+#
+# Кэш готового HTML для страниц, которые целиком определяются входными параметрами
+# и версией каталога. LRU с бюджетом по байтам; при смене версии каталога всё сбрасываем.
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+PAGE_CACHE_BYTES = int(os.getenv("PAGE_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# url_for в шаблонах абсолютный — хост входит в ключ. Host присылает клиент, поэтому
+# кэшируем только свои хосты (SITE_HOSTS через запятую), остальным — рендер без кэша
+SITE_URL = os.getenv("SITE_URL", "https://mycase.md/")
+SITE_HOSTS = frozenset(
+    h.strip().lower() for h in os.getenv("SITE_HOSTS", urlsplit(SITE_URL).netloc).split(",") if h.strip()
+)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPage:
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def cache_base_url(request) -> str | None:
+    """base_url запроса для ключа кэша; None — хост не из SITE_HOSTS, не кэшируем."""
+    base_url = request.base_url
+    return str(base_url) if base_url.netloc.lower() in SITE_HOSTS else None
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+class PageCache:
+    def __init__(self, max_bytes: int = PAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.version: int | None = None
+        self._items: OrderedDict[tuple, CachedPage] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def sync_version(self, version: int) -> None:
+        # каталог поменялся (админка или фоновое обновление) — старые страницы невалидны
+        if self.version != version:
+            self.clear()
+            self.version = version
+
+    def get(self, key: tuple) -> CachedPage | None:
+        page = self._items.get(key)
+        if page is not None:
+            self._items.move_to_end(key)
+        return page
+
+    def put(self, key: tuple, body: bytes) -> CachedPage:
+        page = CachedPage(body=body, etag=make_etag(body))
+        if len(body) > self.max_bytes:
+            return page
+
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old.body)
+
+        self._items[key] = page
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted.body)
+        return page
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.size = 0
+
+
+page_cache = PageCache()
@@ -0,0 +1,23 @@
+# app/core/pagination.py
+#
+# Непрозрачные курсоры для keyset-пагинации по (timestamp, id).
+import base64
+import binascii
+from datetime import datetime
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = f"{ts.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    """Разбирает непрозрачный курсор; мусор -> ValueError."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
@@ -0,0 +1,174 @@
+# app/core/prerender.py
+#
+# Маркетинговые страницы без данных из БД (чехлы, термосы, главная) рендерятся заранее:
+# на каждый язык из SUPPORTED_LANGS — готовые байты + .gz/.br + ETag в памяти.
+# Запрос — это get_lang() и поиск в словаре. Пересборка — на старте (lifespan) и когда
+# меняются шаблоны или словари (prerender_loop следит за mtime).
+#
+# У главной случайный блок дизайнов: на его месте слот (<!--prerender:slot-->), страница
+# хранится двумя кусками, блок рендерится на запросе. Её тело каждый раз разное — без ETag и сжатия.
+import asyncio
+import gzip
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+
+from app.core import templates as tpl
+from app.core.assets import accepts_encoding
+from app.core.page_cache import SITE_URL, cache_base_url, make_etag, etag_matches
+from app.i18n import SUPPORTED_LANGS, get_lang
+
+try:
+    import brotli
+except ImportError:  # br — опционально, gzip есть всегда
+    brotli = None
+
+# путь -> шаблон
+PRERENDERED_PAGES = {
+    "/": "index.html",
+    "/huse_personalizate": "huse_personalizate.html",
+    "/termos": "termos.html",
+}
+SLOT = b"<!--prerender:slot-->"
+
+# url_for в шаблонах абсолютный: страницы собираются под хост; на старте — под SITE_URL,
+# остальные хосты из SITE_HOSTS — при первом запросе, чужие — рендер на лету без хранения
+PRERENDER_WATCH_INTERVAL = int(os.getenv("PRERENDER_WATCH_INTERVAL", "5"))
+WATCH_DIRS = ("app/templates", "app/locales", "app/fonts")  # шрифты: scene_fonts() в редакторах
+
+
+@dataclass(frozen=True, slots=True)
+class PrerenderedPage:
+    body: bytes
+    etag: str | None = None
+    gzip: bytes | None = None
+    br: bytes | None = None
+    # страница со слотом: body — до слота, tail — после
+    tail: bytes | None = None
+
+
+_pages: dict[tuple[str, str, str], PrerenderedPage] = {}
+_hosts: set[str] = set()
+
+
+def _request(app, base_url: str, path: str) -> Request:
+    # минимальный scope: шаблонам нужны url_for и request.url.path
+    url = urlsplit(base_url)
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": url.scheme,
+        "server": (url.hostname, url.port or (443 if url.scheme == "https" else 80)),
+        "root_path": url.path.rstrip("/"),
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"host", url.netloc.encode())],
+        "app": app,
+        "router": app.router,
+    })
+
+
+def _build(app, base_url: str, path: str, lang: str) -> PrerenderedPage:
+    request = _request(app, base_url, path)
+    body = tpl.templates_for(lang).get_template(PRERENDERED_PAGES[path]).render({
+        "request": request,
+        "lang": lang,
+    }).encode("utf-8")
+    if SLOT in body:
+        head, _, tail = body.partition(SLOT)
+        return PrerenderedPage(body=head, tail=tail)
+    return PrerenderedPage(
+        body=body,
+        etag=make_etag(body),
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=11) if brotli else None,
+    )
+
+
+def prerender_all(app, base_url: str = SITE_URL) -> int:
+    _hosts.add(base_url)
+    for path in PRERENDERED_PAGES:
+        for lang in SUPPORTED_LANGS:
+            _pages[(path, lang, base_url)] = _build(app, base_url, path, lang)
+    return len(PRERENDERED_PAGES) * len(SUPPORTED_LANGS)
+
+
+def _page(request: Request, lang: str) -> PrerenderedPage:
+    base_url = cache_base_url(request)
+    if base_url is None:
+        return _build(request.app, str(request.base_url), request.url.path, lang)
+    key = (request.url.path, lang, base_url)
+    page = _pages.get(key)
+    if page is None:
+        page = _pages[key] = _build(request.app, base_url, request.url.path, lang)
+        _hosts.add(base_url)
+    return page
+
+
+def serve_prerendered(request: Request, slot: bytes | None = None) -> Response:
+    """Готовая страница для request.url.path; slot — HTML на место <!--prerender:slot-->."""
+    page = _page(request, get_lang(request))
+    if page.tail is not None:
+        return HTMLResponse(
+            page.body + (slot or b"") + page.tail,
+            headers={"Cache-Control": "no-cache", "Vary": "Cookie"},
+        )
+
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Cookie, Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers=headers)
+    body = page.body
+    accept = request.headers.get("accept-encoding", "")
+    if page.br is not None and accepts_encoding(accept, "br"):
+        body, headers["Content-Encoding"] = page.br, "br"
+    elif accepts_encoding(accept, "gzip"):
+        body, headers["Content-Encoding"] = page.gzip, "gzip"
+    return HTMLResponse(body, headers=headers)
+
+
+def render_slot(request: Request, template_name: str, context: dict) -> bytes:
+    lang = get_lang(request)
+    context.update({"request": request, "lang": lang})
+    return tpl.templates_for(lang).get_template(template_name).render(context).encode("utf-8")
+
+
+def _fingerprint() -> tuple:
+    return tuple(sorted(
+        (str(p), p.stat().st_mtime_ns)
+        for d in WATCH_DIRS for p in Path(d).rglob("*") if p.is_file()
+    ))
+
+
+async def prerender_loop(app) -> None:
+    """Шаблоны или словари поменялись на диске — собрать окружения и страницы заново."""
+    seen = await asyncio.to_thread(_fingerprint)
+    while True:
+        await asyncio.sleep(PRERENDER_WATCH_INTERVAL)
+        try:
+            current = await asyncio.to_thread(_fingerprint)
+            if current == seen:
+                continue
+            seen = current
+            started = time.perf_counter()
+            hosts = set(_hosts) or {SITE_URL}
+
+            def rebuild() -> None:
+                tpl.reload()
+                _pages.clear()
+                for base_url in hosts:
+                    prerender_all(app, base_url)
+
+            await asyncio.to_thread(rebuild)
+            logging.info(f"Prerendered pages rebuilt in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            logging.error(f"Prerender rebuild error: {e}")
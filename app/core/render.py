@@ -1,12 +1,95 @@
-from app.core.templates import templates
-from app.i18n import get_lang, build_i18n_payload
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 
+from app.core.templates import templates_for
+from app.core.page_cache import page_cache, cache_base_url, etag_matches
+from app.i18n import get_lang
 
-def render(request, template_name: str, context: dict):
+
+# потоковый рендер шлёт HTML кусками не меньше этого (и сразу после </head>)
+STREAM_CHUNK_BYTES = 16 * 1024
+
+
+async def _generate(template, context: dict, on_done=None):
+    """
+    Куски generate_async склеиваем: Jinja отдаёт строку на каждый узел шаблона.
+    <head> уходит сразу — браузер начинает тянуть CSS/шрифты, пока рисуется сетка товаров.
+    on_done(body) — весь HTML, когда дорисован (для page_cache).
+    """
+    buf, size, head_sent = [], 0, False
+    parts = [] if on_done else None
+    async for piece in template.generate_async(context):
+        data = piece.encode("utf-8")
+        buf.append(data)
+        size += len(data)
+        if size >= STREAM_CHUNK_BYTES or (not head_sent and b"</head>" in data):
+            head_sent = True
+            chunk = b"".join(buf)
+            buf, size = [], 0
+            if parts is not None:
+                parts.append(chunk)
+            yield chunk
+    chunk = b"".join(buf)
+    if parts is not None:
+        parts.append(chunk)
+        on_done(b"".join(parts))
+    if chunk:
+        yield chunk
+
+
+def render(request, template_name: str, context: dict, status_code: int = 200, stream: bool = False):
+    """stream=True — HTML уходит по мере рендера (большие страницы: первый байт не ждёт всю страницу)."""
     lang = get_lang(request)
     context.update({
         "request": request,
         "lang": lang,
-        "i18n": build_i18n_payload(lang, locales_dir="app/locales"),
     })
-    return templates.TemplateResponse(template_name, context)
\ No newline at end of file
+    if stream:
+        template = templates_for(lang, stream=True).get_template(template_name)
+        return StreamingResponse(_generate(template, context), status_code=status_code, media_type="text/html")
+    return templates_for(lang).TemplateResponse(template_name, context, status_code=status_code)
+
+
+def render_cached(request, template_name: str, context: dict, *, key: tuple, version: int, stream: bool = False):
+    """
+    Как render(), но готовый HTML кладём в page_cache и отдаём с ETag / 304.
+    key — всё, от чего зависит страница помимо языка, пути и версии каталога.
+    stream=True — промах кэша рендерится потоково, в кэш страница попадает, когда дорисована.
+    """
+    base_url = cache_base_url(request)
+    if base_url is None:
+        return render(request, template_name, context, stream=stream)
+    lang = get_lang(request)
+    page_cache.sync_version(version)
+
+    # url_for в шаблонах абсолютный — хост тоже часть ключа
+    full_key = (template_name, lang, base_url, request.url.path) + key
+    page = page_cache.get(full_key)
+    if page is None:
+        context.update({
+            "request": request,
+            "lang": lang,
+        })
+        if stream:
+            def store(body: bytes) -> None:
+                # каталог успел смениться, пока рисовали — такую страницу не кэшируем
+                if page_cache.version == version:
+                    page_cache.put(full_key, body)
+
+            template = templates_for(lang, stream=True).get_template(template_name)
+            return StreamingResponse(
+                _generate(template, context, on_done=store),
+                media_type="text/html",
+                headers={"Cache-Control": "no-cache", "Vary": "Cookie"},
+            )
+        body = templates_for(lang).get_template(template_name).render(context).encode("utf-8")
+        page = page_cache.put(full_key, body)
+
+    headers = {
+        "ETag": page.etag,
+        # браузер/краулер всегда ревалидирует, но получает 304 без тела
+        "Cache-Control": "no-cache",
+        "Vary": "Cookie",
+    }
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
@@ -0,0 +1,303 @@
+# app/core/resumable.py
+#
+# Докачиваемые загрузки фото (протокол в духе tus 1.0: POST — создать,
+# PATCH с Upload-Offset — дописать кусок, HEAD — узнать, сколько уже дошло).
+# Готовая загрузка указывается в заказе по id (поле upload_ids), данные не
+# передаются второй раз; удаляется, когда заказ записан в БД. Брошенные загрузки удаляет gc_loop() по RESUMABLE_TTL
+# (созданные, но без единого куска — уже по RESUMABLE_IDLE_TTL). POST без авторизации,
+# поэтому всё незабранное вместе ограничено RESUMABLE_MAX_PENDING_BYTES / _UPLOADS.
+#
+# На диске: <dir>/<id>.part — данные (его размер и есть offset), <id>.json — метаданные.
+# PATCH держит flock на .part: повтор клиента может прийти в другой воркер uvicorn.
+import asyncio
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+from app.core.uploads import UPLOAD_TMP_DIR, WRITE_BUFFER, StoredPart, StreamedForm, UploadLimits
+
+RESUMABLE_DIR = os.getenv("RESUMABLE_DIR", os.path.join(UPLOAD_TMP_DIR, "resumable"))
+RESUMABLE_TTL = int(os.getenv("RESUMABLE_TTL", str(24 * 3600)))
+RESUMABLE_IDLE_TTL = int(os.getenv("RESUMABLE_IDLE_TTL", str(15 * 60)))
+# по объявленному Upload-Length: место резервируется при создании, а не по мере кусков
+RESUMABLE_MAX_PENDING_BYTES = int(os.getenv("RESUMABLE_MAX_PENDING_BYTES", str(2 * 1024 * 1024 * 1024)))
+RESUMABLE_MAX_PENDING_UPLOADS = int(os.getenv("RESUMABLE_MAX_PENDING_UPLOADS", "1000"))
+RESUMABLE_GC_INTERVAL = 15 * 60
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class ResumableUpload:
+    id: str
+    length: int
+    filename: str
+    offset: int = 0
+    sha256: str | None = None  # есть только у завершённой
+
+    @property
+    def complete(self) -> bool:
+        return self.offset >= self.length
+
+
+def _paths(upload_id: str) -> tuple[str, str]:
+    base = os.path.join(RESUMABLE_DIR, upload_id)
+    return base + ".part", base + ".json"
+
+
+def _check_id(upload_id: str) -> str:
+    if not _ID_RE.match(upload_id or ""):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload_id
+
+
+def _load(upload_id: str) -> ResumableUpload:
+    part, meta = _paths(_check_id(upload_id))
+    try:
+        with open(meta, encoding="utf-8") as f:
+            data = json.load(f)
+        offset = os.path.getsize(part)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return ResumableUpload(id=upload_id, offset=offset, **data)
+
+
+def _save_meta(upload: ResumableUpload) -> None:
+    _, meta = _paths(upload.id)
+    tmp = meta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"length": upload.length, "filename": upload.filename, "sha256": upload.sha256}, f)
+    os.replace(tmp, meta)
+
+
+def _pending() -> tuple[int, int]:
+    count = total = 0
+    for entry in os.scandir(RESUMABLE_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path, encoding="utf-8") as f:
+                total += int(json.load(f)["length"])
+            count += 1
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+    return count, total
+
+
+def _create(length: int, filename: str) -> ResumableUpload:
+    os.makedirs(RESUMABLE_DIR, exist_ok=True)
+    # проверка квоты и создание — под общим lock всех воркеров
+    with open(os.path.join(RESUMABLE_DIR, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        count, total = _pending()
+        if count >= RESUMABLE_MAX_PENDING_UPLOADS or total + length > RESUMABLE_MAX_PENDING_BYTES:
+            logging.warning(f"Resumable uploads quota exhausted: {count} uploads, {total} bytes")
+            # клиент после ретраев шлёт фото прямо в форме заказа
+            raise HTTPException(status_code=503, detail="Upload storage is full, try again later")
+        upload = ResumableUpload(id=uuid.uuid4().hex, length=length, filename=filename)
+        part, _ = _paths(upload.id)
+        open(part, "wb").close()
+        _save_meta(upload)
+    return upload
+
+
+async def create_upload(length: int, filename: str, limits: UploadLimits | None = None) -> ResumableUpload:
+    limits = limits or UploadLimits()
+    if length <= 0:
+        raise HTTPException(status_code=400, detail="Upload-Length must be positive")
+    if length > limits.max_file_bytes:
+        raise HTTPException(status_code=413, detail="File is too large")
+    return await asyncio.to_thread(_create, length, os.path.basename(filename or "")[:200] or "photo")
+
+
+async def get_upload(upload_id: str) -> ResumableUpload:
+    return await asyncio.to_thread(_load, upload_id)
+
+
+def _finish(upload: ResumableUpload) -> None:
+    part, _ = _paths(upload.id)
+    h = hashlib.sha256()
+    with open(part, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    upload.sha256 = h.hexdigest()
+    _save_meta(upload)
+
+
+def _open_locked(upload_id: str):
+    part, _ = _paths(_check_id(upload_id))
+    try:
+        # без O_CREAT: загрузку могли удалить (DELETE, GC) — тогда 404, а не пустой .part
+        f = os.fdopen(os.open(part, os.O_WRONLY | os.O_APPEND), "ab")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        # lock на открытый файл, не на процесс: два PATCH и в одном воркере, и в разных
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        # клиент на 409 спрашивает HEAD и продолжает с актуального offset
+        raise HTTPException(status_code=409, detail="Upload is busy")
+    return f
+
+
+async def append_chunk(upload_id: str, offset: int, chunks) -> ResumableUpload:
+    """
+    Дописывает тело PATCH-запроса. offset клиента должен совпасть с текущим (иначе 409 —
+    клиент спрашивает HEAD и продолжает с нужного места). Оборванный запрос не страшен:
+    буфер дописывается и при ошибке, всё дошедшее попадает в файл и в offset (HEAD).
+    Теряется только то, что не успело записаться до падения самого процесса.
+    """
+    f = await asyncio.to_thread(_open_locked, upload_id)
+    try:
+        # offset — размер .part, читаем уже под lock
+        upload = await get_upload(upload_id)
+        if upload.complete:
+            raise HTTPException(status_code=409, detail="Upload is already complete")
+        if offset != upload.offset:
+            raise HTTPException(status_code=409, detail=f"Offset mismatch, expected {upload.offset}")
+
+        buf = bytearray()
+        try:
+            async for chunk in chunks:
+                if upload.offset + len(buf) + len(chunk) > upload.length:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds Upload-Length")
+                buf += chunk
+                if len(buf) >= WRITE_BUFFER:
+                    await asyncio.to_thread(f.write, bytes(buf))
+                    upload.offset += len(buf)
+                    buf.clear()
+        finally:
+            # и при обрыве соединения: в буфере только проверенные байты, пусть будут в offset
+            if buf:
+                await asyncio.to_thread(f.write, bytes(buf))
+                upload.offset += len(buf)
+
+        if upload.complete:
+            await asyncio.to_thread(f.flush)
+            await asyncio.to_thread(_finish, upload)
+        return upload
+    finally:
+        # close снимает flock
+        await asyncio.to_thread(f.close)
+
+
+async def delete_upload(upload_id: str) -> None:
+    def run() -> None:
+        for path in _paths(_check_id(upload_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    await asyncio.to_thread(run)
+
+
+def _claim(upload_ids: list[str], dst_dir: str, max_bytes: int) -> list[StoredPart]:
+    uploads = [_load(upload_id) for upload_id in upload_ids]
+    for upload in uploads:
+        if not upload.complete or not upload.sha256:
+            raise HTTPException(status_code=409, detail=f"Upload {upload.id} is not complete")
+    if sum(upload.length for upload in uploads) > max_bytes:
+        raise HTTPException(status_code=413, detail="Request is too large")
+
+    parts = []
+    for upload in uploads:
+        part, _ = _paths(upload.id)
+        path = os.path.join(dst_dir, f"resumable_{upload.id}")
+        # жёсткая ссылка, не перенос: оригинал живёт, пока заказ не записан (release_uploads).
+        # Отказ дальше по пайплайну не съедает загрузки — клиент повторит с теми же id
+        try:
+            os.link(part, path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.copyfile(part, path)  # RESUMABLE_DIR на другом диске
+        parts.append(StoredPart(
+            field="files",
+            filename=upload.filename,
+            path=path,
+            size=upload.length,
+            content_type="application/octet-stream",
+            sha256=upload.sha256,
+        ))
+    return parts
+
+
+async def claim_uploads(form: StreamedForm, limits: UploadLimits | None = None) -> list[str]:
+    """
+    upload_ids из формы заказа ("id1,id2") -> в form.files["files"] после частей из multipart,
+    как если бы пришли вместе с формой (индексы file:N сцены не съезжают). Лимиты формы
+    (файлы, байты) — общие с multipart. Возвращает id: после записи заказа — release_uploads.
+    """
+    limits = limits or UploadLimits()
+    upload_ids = [i.strip() for i in form.get("upload_ids").split(",") if i.strip()]
+    if not upload_ids:
+        return []
+    if len(set(upload_ids)) != len(upload_ids):
+        raise HTTPException(status_code=400, detail="Duplicate upload id")
+    if sum(map(len, form.files.values())) + len(upload_ids) > limits.max_files:
+        raise HTTPException(status_code=413, detail="Too many files")
+    received = sum(part.size for parts in form.files.values() for part in parts)
+    parts = await asyncio.to_thread(_claim, upload_ids, form.tmp_dir, limits.max_request_bytes - received)
+    form.files.setdefault("files", []).extend(parts)
+    return upload_ids
+
+
+async def release_uploads(upload_ids: list[str]) -> None:
+    for upload_id in upload_ids:
+        await delete_upload(upload_id)
+
+
+def _gc() -> int:
+    if not os.path.isdir(RESUMABLE_DIR):
+        return 0
+    now = time.time()
+    ids = {name.split(".", 1)[0] for name in os.listdir(RESUMABLE_DIR) if _ID_RE.match(name.split(".", 1)[0])}
+    removed = 0
+    for upload_id in ids:
+        part, meta = _paths(upload_id)
+        try:
+            # mtime .part обновляется каждым куском — живые загрузки не трогаем;
+            # пустой .part — загрузку создали и не начали
+            st = os.stat(part)
+            ttl = RESUMABLE_IDLE_TTL if st.st_size == 0 else RESUMABLE_TTL
+            mtime = st.st_mtime
+        except FileNotFoundError:
+            ttl = RESUMABLE_TTL
+            try:
+                mtime = os.path.getmtime(meta)
+            except FileNotFoundError:
+                mtime = 0.0
+        if now - mtime < ttl:
+            continue
+        for path in (part, meta, meta + ".tmp"):
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+async def gc_loop() -> None:
+    while True:
+        try:
+            removed = await asyncio.to_thread(_gc)
+            if removed:
+                logging.info(f"Resumable uploads GC: removed {removed} files")
+        except Exception as e:
+            logging.error(f"Resumable uploads GC error: {e}")
+        await asyncio.sleep(RESUMABLE_GC_INTERVAL)
@@ -0,0 +1,463 @@
+# app/core/scene.py
+#
+# Дизайн как сцена fabric.js (canvas.toJSON) вместо готового PNG.
+# Клиент шлёт JSON сцены + исходные фото (они и так уходят в files), картинки
+# в сцене ссылаются на них как "file:N". PNG печатного разрешения рисуем
+# сами, лениво — когда он реально нужен (админка / уведомление в Telegram),
+# в пуле процессов; результат ложится в хранилище блобов и в манифест заказа.
+#
+# Поддерживается то, что реально создают наши редакторы: фон (цвет / картинка),
+# overlayImage (макет поверх всего), image, text / i-text / textbox; позиция, origin,
+# масштаб, поворот, отражение, прозрачность, crop. Всё, что нарисовать не можем
+# (clipPath, тени, обводка, разрядка), validate_scene отклоняет — клиент шлёт PNG.
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.blobs import add_order_files, blob_path, store_part
+from app.core.images import ImageResizer, run_in_pool
+from app.core.uploads import UPLOAD_TMP_DIR, StoredPart
+from app.db.database import SessionLocal, Order, OrderFile
+
+SCENE_RENDER_WIDTH = int(os.getenv("SCENE_RENDER_WIDTH", "1260"))  # 3x от ширины редактора
+# TTF/OTF семейств из редакторов (RobotoSlab-Bold.ttf, ...), в репозитории их нет — см.
+# app/fonts/README.md. Текст шрифтом, которого здесь нет, сцена не принимает — клиент
+# шлёт PNG (scene_fonts() уходит в редактор); пустая папка = весь текст идёт PNG
+SCENE_FONTS_DIR = Path(os.getenv("SCENE_FONTS_DIR", "app/fonts"))
+SCENE_MAX_OBJECTS = 50
+SCENE_MAX_SIDE = 2000  # размеры самого канваса в CSS-пикселях
+# ширина PNG фиксирована, высота — по пропорции канваса: узкий высокий канвас дал бы
+# холст в гигабайты. Лимит пикселей — и на холст, и на каждый слой (RGBA, 4 байта на пиксель)
+SCENE_MAX_ASPECT = 4
+SCENE_MAX_PIXELS = int(os.getenv("SCENE_MAX_PIXELS", str(16_000_000)))
+SCENE_MAX_SCALE = 20
+SCENE_MAX_FONT_SIZE = 400
+PREVIEW_SIDE = 320
+
+IMAGE_TYPES = {"image"}
+TEXT_TYPES = {"text", "i-text", "textbox"}
+# слои сцены-картинки: фон под объектами, оверлей над ними
+SCENE_IMAGES = ("backgroundImage", "overlayImage")
+
+
+def _reject(detail: str) -> HTTPException:
+    return HTTPException(status_code=422, detail=f"design_scene: {detail}")
+
+
+def _check_src(src, n_files: int) -> None:
+    if not isinstance(src, str):
+        raise _reject("image without src")
+    if src.startswith("file:"):
+        idx = src[len("file:"):]
+        if not idx.isdigit() or int(idx) >= n_files:
+            raise _reject(f"unknown file reference {src!r}")
+        return
+    path = urlparse(src).path
+    if not path.startswith("/static/") or ImageResizer.resolve_source(path[len("/static/"):]) is None:
+        raise _reject("images must be uploaded files or site assets")
+
+
+def _font_key(family: str) -> str:
+    # "Roboto Slab, serif" и RobotoSlab-Bold.ttf -> "robotoslab"
+    return re.sub(r"[^a-z0-9]", "", str(family or "").split(",")[0].lower())
+
+
+def _font_files() -> dict[str, list[Path]]:
+    files = {}
+    if SCENE_FONTS_DIR.is_dir():
+        for p in sorted(SCENE_FONTS_DIR.iterdir()):
+            if p.suffix.lower() in (".ttf", ".otf"):
+                files.setdefault(_font_key(re.split(r"[-_\[]", p.stem)[0]), []).append(p)
+    return files
+
+
+_fonts_warned = False
+
+
+def scene_fonts() -> list[str]:
+    """Семейства, которые сервер умеет рисовать (ключи _font_key) — для редакторов."""
+    global _fonts_warned
+    fonts = sorted(_font_files())
+    if not fonts and not _fonts_warned:
+        _fonts_warned = True
+        logging.warning(f"No fonts in {SCENE_FONTS_DIR}: designs with text are sent as PNG (see app/fonts/README.md)")
+    return fonts
+
+
+def _check_renderable(obj: dict, what: str) -> None:
+    # у fabric эти ключи есть всегда, со значениями по умолчанию — мешают только заданные
+    if obj.get("clipPath"):
+        raise _reject(f"{what}: clipPath is not supported")
+    if obj.get("shadow"):
+        raise _reject(f"{what}: shadow is not supported")
+    if obj.get("stroke") and obj.get("strokeWidth", 1) != 0:
+        raise _reject(f"{what}: stroke is not supported")
+    if obj.get("type") in TEXT_TYPES and obj.get("charSpacing") not in (None, 0):
+        raise _reject(f"{what}: charSpacing is not supported")
+
+
+def validate_scene(raw: str, n_files: int) -> dict:
+    """Дешёвая проверка при приёме заказа, без растеризации."""
+    try:
+        scene = json.loads(raw)
+    except ValueError:
+        raise _reject("invalid JSON")
+    if not isinstance(scene, dict) or not isinstance(scene.get("objects"), list):
+        raise _reject("objects are missing")
+
+    try:
+        width, height = float(scene["width"]), float(scene["height"])
+    except (KeyError, TypeError, ValueError):
+        raise _reject("canvas size is missing")
+    if not (0 < width <= SCENE_MAX_SIDE and 0 < height <= SCENE_MAX_SIDE):
+        raise _reject("canvas size is out of range")
+    if max(width, height) / min(width, height) > SCENE_MAX_ASPECT:
+        raise _reject("canvas aspect ratio is out of range")
+    if SCENE_RENDER_WIDTH ** 2 * height / width > SCENE_MAX_PIXELS:
+        raise _reject("canvas is too large to render")
+
+    if scene.get("clipPath"):
+        raise _reject("canvas clipPath is not supported")
+
+    objects = scene["objects"]
+    if len(objects) > SCENE_MAX_OBJECTS:
+        raise _reject("too many objects")
+    fonts = None
+    for obj in objects:
+        kind = obj.get("type") if isinstance(obj, dict) else None
+        if kind in IMAGE_TYPES:
+            _check_src(obj.get("src"), n_files)
+        elif kind in TEXT_TYPES:
+            fonts = fonts if fonts is not None else _font_files()
+            if _font_key(obj.get("fontFamily")) not in fonts:
+                raise _reject(f"font {obj.get('fontFamily')!r} is not available")
+        else:
+            raise _reject(f"unsupported object type {kind!r}")
+        _check_renderable(obj, kind)
+
+    for key in SCENE_IMAGES:
+        image = scene.get(key)
+        if image:
+            if not isinstance(image, dict):
+                raise _reject(f"invalid {key}")
+            _check_src(image.get("src"), n_files)
+            _check_renderable(image, key)
+    return scene
+
+
+def bind_scene(scene: dict, file_keys: list[str]) -> dict:
+    """file:N -> blob:<key> после того, как файлы легли в хранилище."""
+    def bind(obj: dict) -> None:
+        src = obj.get("src") or ""
+        if src.startswith("file:"):
+            obj["src"] = "blob:" + file_keys[int(src[len("file:"):])]
+
+    for obj in scene["objects"]:
+        if obj.get("type") in IMAGE_TYPES:
+            bind(obj)
+    for key in SCENE_IMAGES:
+        if scene.get(key):
+            bind(scene[key])
+    return scene
+
+
+async def store_scene(scene: dict, tmp_dir: str):
+    data = json.dumps(scene, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    path = os.path.join(tmp_dir, "design.scene.json")
+
+    def write() -> None:
+        with open(path, "wb") as f:
+            f.write(data)
+
+    await asyncio.to_thread(write)
+    return await store_part(StoredPart(
+        field="design_scene",
+        filename="design.scene.json",
+        path=path,
+        size=len(data),
+        content_type="application/json",
+        sha256=hashlib.sha256(data).hexdigest(),
+    ))
+
+
+# ---------------- растеризация (дочерний процесс) ----------------
+
+def _source_path(src: str) -> str:
+    if src.startswith("blob:"):
+        return str(blob_path(src[len("blob:"):]))
+    return str(ImageResizer.resolve_source(urlparse(src).path[len("/static/"):]))
+
+
+def _num(obj: dict, key: str, default: float, lo: float, hi: float) -> float:
+    # числа из сцены — от клиента: мусор -> default, остальное в [lo, hi]
+    try:
+        value = float(obj.get(key, default))
+    except (TypeError, ValueError):
+        return default
+    return min(max(value, lo), hi) if math.isfinite(value) else default
+
+
+def _check_layer(w: int, h: int) -> None:
+    if w * h > SCENE_MAX_PIXELS:
+        raise ValueError(f"layer {w}x{h} is too large")
+
+
+def _font(family: str, weight, style: str, size: int):
+    from PIL import ImageFont
+
+    bold = str(weight) == "bold" or (str(weight).isdigit() and int(weight) >= 600)
+    italic = style == "italic"
+    candidates = []
+    for p in _font_files().get(_font_key(family), []):
+        stem = p.stem.lower()
+        score = (("bold" in stem) == bold) + (("italic" in stem) == italic) + ("regular" in stem)
+        candidates.append((score, str(p)))
+    if candidates:
+        return ImageFont.truetype(max(candidates)[1], size)
+    # шрифт пропал после приёма сцены — встроенный в Pillow, геометрия сохранится, начертание нет
+    return ImageFont.load_default(size)
+
+
+def _wrap(draw, text: str, font, max_width: float) -> list[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split(" ")
+        line = ""
+        for word in words:
+            candidate = f"{line} {word}" if line else word
+            if line and draw.textlength(candidate, font=font) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _text_layer(obj: dict, scale: float):
+    from PIL import Image, ImageColor, ImageDraw
+
+    font_size = max(1, round(_num(obj, "fontSize", 40, 1, SCENE_MAX_FONT_SIZE) * scale))
+    font = _font(obj.get("fontFamily", ""), obj.get("fontWeight", "normal"), obj.get("fontStyle", "normal"), font_size)
+    text = str(obj.get("text", ""))
+    w = max(1, round(_num(obj, "width", 1, 1, SCENE_MAX_SIDE) * scale))
+    h = max(1, round(_num(obj, "height", 1, 1, SCENE_MAX_SIDE) * scale))
+
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    lines = _wrap(measure, text, font, w) if obj.get("type") == "textbox" else text.split("\n")
+    line_height = font_size * float(obj.get("lineHeight", 1.16))
+    # серверный шрифт может быть шире браузерного — не обрезаем, расширяем блок
+    w = max(w, *(math.ceil(measure.textlength(line, font=font)) for line in lines))
+    h = max(h, math.ceil(line_height * len(lines)))
+    _check_layer(w, h)
+
+    layer = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    try:
+        fill = ImageColor.getcolor(obj.get("fill") or "#000000", "RGBA")
+    except ValueError:
+        fill = (0, 0, 0, 255)
+
+    align = obj.get("textAlign", "left")
+    for i, line in enumerate(lines):
+        lw = draw.textlength(line, font=font)
+        x = (w - lw) / 2 if align == "center" else (w - lw if align == "right" else 0)
+        draw.text((x, i * line_height), line, font=font, fill=fill)
+    return layer
+
+
+def _image_layer(obj: dict, scale: float):
+    from PIL import Image, ImageOps
+
+    with Image.open(_source_path(obj["src"])) as src:
+        im = ImageOps.exif_transpose(src).convert("RGBA")
+
+    # width/height/crop в сцене — в пикселях картинки, которую видел браузер;
+    # у нас она могла быть уменьшена нормализацией
+    width = _num(obj, "width", 0, 0, 100_000) or im.width
+    height = _num(obj, "height", 0, 0, 100_000) or im.height
+    crop_x, crop_y = _num(obj, "cropX", 0, 0, 100_000), _num(obj, "cropY", 0, 0, 100_000)
+    k = im.width / (width + crop_x)
+    crop_x, crop_y, box_w, box_h = crop_x * k, crop_y * k, width * k, height * k
+    if crop_x or crop_y or box_w < im.width or box_h < im.height:
+        # за края не выходим: crop за пределами картинки выделил бы память под пустоту
+        im = im.crop((
+            round(crop_x), round(crop_y),
+            min(im.width, round(crop_x + box_w)), min(im.height, round(crop_y + box_h)),
+        ))
+
+    target = (
+        max(1, round(width * abs(_num(obj, "scaleX", 1, -SCENE_MAX_SCALE, SCENE_MAX_SCALE)) * scale)),
+        max(1, round(height * abs(_num(obj, "scaleY", 1, -SCENE_MAX_SCALE, SCENE_MAX_SCALE)) * scale)),
+    )
+    _check_layer(*target)
+    return im.resize(target, Image.Resampling.LANCZOS)
+
+
+def _place(canvas, layer, obj: dict, scale: float) -> None:
+    from PIL import Image, ImageOps
+
+    if obj.get("flipX"):
+        layer = ImageOps.mirror(layer)
+    if obj.get("flipY"):
+        layer = ImageOps.flip(layer)
+
+    opacity = float(obj.get("opacity", 1))
+    if opacity < 1:
+        alpha = layer.getchannel("A").point(lambda a: round(a * max(0.0, opacity)))
+        layer.putalpha(alpha)
+
+    # fabric: left/top — точка origin; центр объекта = origin + поворот смещения до центра
+    w, h = layer.size
+    ox = {"left": 0.0, "center": 0.5, "right": 1.0}.get(obj.get("originX", "left"), 0.0)
+    oy = {"top": 0.0, "center": 0.5, "bottom": 1.0}.get(obj.get("originY", "top"), 0.0)
+    angle = float(obj.get("angle", 0))
+    rad = math.radians(angle)
+    dx, dy = (0.5 - ox) * w, (0.5 - oy) * h
+    cx = float(obj.get("left", 0)) * scale + dx * math.cos(rad) - dy * math.sin(rad)
+    cy = float(obj.get("top", 0)) * scale + dx * math.sin(rad) + dy * math.cos(rad)
+
+    if angle % 360:
+        # в fabric угол по часовой, в Pillow — против
+        layer = layer.rotate(-angle, resample=Image.Resampling.BICUBIC, expand=True)
+    canvas.alpha_composite(layer, (round(cx - layer.width / 2), round(cy - layer.height / 2)))
+
+
+def _render(scene: dict, out_width: int, out_path: str, preview_path: str) -> dict:
+    # выполняется в дочернем процессе
+    from PIL import Image, ImageColor
+
+    scale = out_width / float(scene["width"])
+    size = (out_width, max(1, round(float(scene["height"]) * scale)))
+    # validate_scene это уже проверил; здесь — для сцен, принятых до лимитов
+    _check_layer(*size)
+
+    try:
+        bg = ImageColor.getcolor(scene.get("background") or "#00000000", "RGBA")
+    except ValueError:
+        bg = (0, 0, 0, 0)
+    canvas = Image.new("RGBA", size, bg)
+
+    layers = []
+    if scene.get("backgroundImage"):
+        layers.append(scene["backgroundImage"])
+    layers.extend(scene["objects"])
+    if scene.get("overlayImage"):
+        layers.append(scene["overlayImage"])
+
+    for obj in layers:
+        if obj.get("visible") is False:
+            continue
+        try:
+            if obj.get("type") in TEXT_TYPES:
+                layer = _text_layer(obj, scale * abs(_num(obj, "scaleX", 1, -SCENE_MAX_SCALE, SCENE_MAX_SCALE)))
+            else:
+                layer = _image_layer(obj, scale)
+        except (OSError, ValueError) as e:
+            # битый/пропавший источник или слой больше лимита не должен ронять весь дизайн
+            logging.error(f"Scene layer skipped: {e}")
+            continue
+        _place(canvas, layer, obj, scale)
+
+    canvas.save(out_path, format="PNG", compress_level=6)
+    preview = canvas.copy()
+    preview.thumbnail((PREVIEW_SIDE, PREVIEW_SIDE), Image.Resampling.LANCZOS)
+    preview.save(preview_path, format="WEBP", quality=75, method=4)
+
+    def digest(path: str) -> str:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    return {
+        "size": os.path.getsize(out_path),
+        "sha256": digest(out_path),
+        "preview_size": os.path.getsize(preview_path),
+        "preview_sha256": digest(preview_path),
+    }
+
+
+# ---------------- ленивый рендер для заказа ----------------
+
+_inflight: dict[int, asyncio.Future] = {}
+
+
+async def _design_files(session, order_id: int) -> dict[str, OrderFile]:
+    files = (await session.execute(
+        select(OrderFile).where(OrderFile.order_id == order_id, OrderFile.role.in_(("design", "design_scene")))
+    )).scalars().all()
+    return {f.role: f for f in files}
+
+
+async def _render_order(order_id: int) -> str | None:
+    async with SessionLocal() as session:
+        by_role = await _design_files(session, order_id)
+        if "design" in by_role:
+            return str(blob_path(by_role["design"].blob_key))
+        if "design_scene" not in by_role:
+            return None
+
+        scene_path = blob_path(by_role["design_scene"].blob_key)
+        scene = json.loads(await asyncio.to_thread(scene_path.read_bytes))
+
+        tmp_dir = os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex)
+        os.makedirs(tmp_dir, exist_ok=True)
+        out_path, preview_path = os.path.join(tmp_dir, "design.png"), os.path.join(tmp_dir, "design.preview.webp")
+        try:
+            r = await run_in_pool(_render, scene, SCENE_RENDER_WIDTH, out_path, preview_path)
+            design = await store_part(StoredPart(
+                field="design_image", filename="design.png", path=out_path,
+                size=r["size"], content_type="image/png", sha256=r["sha256"],
+            ))
+            preview = await store_part(StoredPart(
+                field="design_image", filename="design.preview.webp", path=preview_path,
+                size=r["preview_size"], content_type="image/webp", sha256=r["preview_sha256"],
+            ))
+        finally:
+            await asyncio.to_thread(shutil.rmtree, tmp_dir, True)
+
+        # _inflight — только в своём процессе: админка в одном воркере и outbox в другом
+        # могут нарисовать одно и то же. Второй design не даст вставить уникальный индекс
+        # ux_order_files_design — проигравший берёт то, что записал первый
+        try:
+            await add_order_files(session, order_id, [("design", design, "design.png", preview)])
+            order = await session.get(Order, order_id)
+            if order is not None:
+                order.design_url = design.url
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            existing = (await _design_files(session, order_id)).get("design")
+            if existing is None:
+                raise
+            return str(blob_path(existing.blob_key))
+        logging.info(f"Order #{order_id}: design rendered from scene")
+        return str(design.path)
+
+
+async def render_order_design(order_id: int) -> str | None:
+    """
+    Путь к PNG дизайна заказа; для заказов со сценой рисует его при первом обращении.
+    None — у заказа нет ни картинки, ни сцены.
+    """
+    fut = _inflight.get(order_id)
+    if fut is not None:
+        return await fut
+    fut = asyncio.ensure_future(_render_order(order_id))
+    _inflight[order_id] = fut
+    try:
+        return await fut
+    finally:
+        _inflight.pop(order_id, None)
+
@@ -1,5 +1,82 @@
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+
 from fastapi.templating import Jinja2Templates
-from app.i18n import install_jinja_i18n
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app.i18n import install_jinja_i18n, i18n_script, i18n_script_url, reload_locales, DEFAULT_LANG, SUPPORTED_LANGS
+from app.core.images import img_url, img_srcset
+from app.core.assets import static_url
+from app.core.scene import scene_fonts
+
+TEMPLATES_DIR = "app/templates"
+# байткод шаблонов на диске — общий для всех воркеров и переживает рестарт
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", ".cache/jinja")
+
+
+def _bytecode_cache(lang: str, is_async: bool) -> FileSystemBytecodeCache:
+    # переводы вкомпилированы в код (CompiledTranslations): в имени файла — язык и версия словаря,
+    # иначе после правки ro.json подхватился бы старый байткод. async-шаблоны компилируются иначе
+    version = hashlib.sha256(Path(f"app/locales/{lang}.json").read_bytes()).hexdigest()[:10]
+    kind = "async" if is_async else "sync"
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    return FileSystemBytecodeCache(TEMPLATE_CACHE_DIR, pattern=f"__jinja2_{lang}_{kind}_{version}_%s.cache")
+
+
+def _make_templates(lang: str, is_async: bool = False) -> Jinja2Templates:
+    # окружение собираем сами: опции Jinja через Jinja2Templates(**kwargs) в Starlette устарели
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=True,
+        bytecode_cache=_bytecode_cache(lang, is_async),
+        enable_async=is_async,
+    )
+    tpl = Jinja2Templates(env=env)
+    install_jinja_i18n(tpl, locales_dir="app/locales", lang=lang)
+    tpl.env.globals["img_url"] = img_url
+    tpl.env.globals["img_srcset"] = img_srcset
+    tpl.env.globals["static_url"] = static_url
+    tpl.env.globals["i18n_script_url"] = i18n_script_url
+    tpl.env.globals["scene_fonts"] = scene_fonts
+    return tpl
+
+
+# по окружению на язык: t('...') переведён при компиляции, на рендере — готовые строки
+_by_lang = {lang: _make_templates(lang) for lang in sorted(SUPPORTED_LANGS)}
+templates = _by_lang[DEFAULT_LANG]
+# async-варианты для потокового рендера (render(..., stream=True)): generate_async
+_streaming_by_lang = {lang: _make_templates(lang, is_async=True) for lang in sorted(SUPPORTED_LANGS)}
+
+
+def templates_for(lang: str, stream: bool = False) -> Jinja2Templates:
+    if stream:
+        return _streaming_by_lang.get(lang, _streaming_by_lang[DEFAULT_LANG])
+    return _by_lang.get(lang, templates)
+
+
+def reload() -> None:
+    """
+    Шаблоны или словари поменялись на диске. Переводы вкомпилированы в шаблоны,
+    поэтому окружения собираются заново (байткод — уже под новую версию словаря).
+    """
+    global templates
+    reload_locales()
+    for lang in sorted(SUPPORTED_LANGS):
+        _by_lang[lang] = _make_templates(lang)
+        _streaming_by_lang[lang] = _make_templates(lang, is_async=True)
+    templates = _by_lang[DEFAULT_LANG]
+
 
-templates = Jinja2Templates(directory="app/templates")
-install_jinja_i18n(templates, locales_dir="app/locales")
+def warm_up() -> None:
+    """Компилирует все шаблоны каждого языка и грузит словари — до первого запроса (lifespan)."""
+    started = time.perf_counter()
+    count = 0
+    for lang in _by_lang:
+        i18n_script(lang)  # заодно грузит словарь языка
+        for tpl in (_by_lang[lang], _streaming_by_lang[lang]):
+            for name in tpl.env.list_templates(extensions=["html"]):
+                tpl.env.get_template(name)
+                count += 1
+    logging.info(f"Templates warmed up: {count} in {(time.perf_counter() - started) * 1000:.0f}ms")
@@ -0,0 +1,77 @@
+# app/core/tg_files.py
+#
+# Кэш file_id Telegram по содержимому файла (sha256 + тип отправки).
+# Первый раз файл заливается, дальше уходит только file_id — картинки каталога
+# и повторяющиеся дизайны не гоняем по сети на каждый заказ.
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.blobs import BLOB_DIR
+from app.db.database import SessionLocal, TgFileId
+
+_ids: dict[tuple[str, str], str] = {}
+_digests: dict[tuple[str, int, int], str] = {}
+_BLOB_ROOT = BLOB_DIR.absolute()
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+async def file_digest(path: Path) -> str:
+    # блоб хранилища назван своим sha256 (blobs/ab/cd/<sha256>.<ext>) — читать незачем;
+    # хэшируем только файлы вне хранилища (старые папки заказов, картинки каталога)
+    if _SHA256_RE.match(path.stem) and Path(os.path.abspath(path)).is_relative_to(_BLOB_ROOT):
+        return path.stem
+    st = path.stat()
+    memo_key = (str(path), st.st_mtime_ns, st.st_size)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        digest = await asyncio.to_thread(_sha256, path)
+        _digests[memo_key] = digest
+    return digest
+
+
+async def lookup(digest: str, kind: str) -> str | None:
+    file_id = _ids.get((digest, kind))
+    if file_id is None:
+        async with SessionLocal() as session:
+            row = await session.get(TgFileId, (digest, kind))
+        if row is not None:
+            file_id = _ids[(digest, kind)] = row.file_id
+    return file_id
+
+
+async def remember(digest: str, kind: str, file_id: str) -> None:
+    _ids[(digest, kind)] = file_id
+    try:
+        async with SessionLocal() as session:
+            if session.bind.dialect.name == "postgresql":
+                stmt = pg_insert(TgFileId).values(sha256=digest, kind=kind, file_id=file_id)
+                stmt = stmt.on_conflict_do_update(index_elements=["sha256", "kind"], set_={"file_id": file_id})
+                await session.execute(stmt)
+            else:
+                await session.merge(TgFileId(sha256=digest, kind=kind, file_id=file_id))
+            await session.commit()
+    except Exception as e:
+        # кэш — оптимизация, отправку из-за него не валим
+        logging.warning(f"tg_file_ids save error: {e}")
+
+
+async def forget(digest: str, kind: str) -> None:
+    _ids.pop((digest, kind), None)
+    async with SessionLocal() as session:
+        await session.execute(delete(TgFileId).where(TgFileId.sha256 == digest, TgFileId.kind == kind))
+        await session.commit()
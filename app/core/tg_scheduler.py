@@ -0,0 +1,124 @@
+# app/core/tg_scheduler.py
+#
+# Все вызовы Bot API для уведомлений идут через планировщик:
+# токен-бакет на чат + общий бакет на бота, 429 (RetryAfter) — ждём сколько сказали
+# и повторяем. При всплеске заказов очередь рассасывается с максимальной разрешённой
+# скоростью вместо пачки 429.
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Awaitable, Callable
+
+from telegram.error import RetryAfter
+
+# лимиты Bot API: ~30 сообщений/с на бота, в группу — ~20 в минуту
+TG_GLOBAL_PER_SECOND = float(os.getenv("TG_GLOBAL_PER_SECOND", "30"))
+TG_CHAT_PER_MINUTE = float(os.getenv("TG_CHAT_PER_MINUTE", "20"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "5"))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # токенов в секунду
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        # asyncio.Lock честный (FIFO) — кто раньше встал, тот раньше отправит
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+    def block(self, seconds: float) -> None:
+        """Телеграм попросил подождать: до этого момента никто не отправляет."""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+        self.updated = now
+
+
+def _retry_after_seconds(e: RetryAfter) -> float:
+    value = e.retry_after
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class TelegramScheduler:
+    def __init__(
+        self,
+        global_per_second: float = TG_GLOBAL_PER_SECOND,
+        chat_per_minute: float = TG_CHAT_PER_MINUTE,
+        max_retries: int = TG_MAX_RETRIES,
+    ):
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chat_rate = chat_per_minute / 60
+        self._chat_capacity = chat_per_minute
+        self._chats: dict[str, TokenBucket] = {}
+        self._pending: dict[str, int] = defaultdict(int)
+        self.sent = 0
+        self.rate_limited = 0
+
+    def _chat_bucket(self, chat: str) -> TokenBucket:
+        bucket = self._chats.get(chat)
+        if bucket is None:
+            bucket = self._chats[chat] = TokenBucket(self._chat_rate, self._chat_capacity)
+        return bucket
+
+    async def call(self, chat_id, method: Callable[..., Awaitable[Any]], *, cost: int = 1, **kwargs) -> Any:
+        """
+        Вызывает method(chat_id=..., **kwargs) с учётом лимитов.
+        cost — сколько сообщений стоит вызов (альбом из N = N сообщений).
+        Файлы передавать путями (Path), а не открытыми файлами — иначе повтор пошлёт пустоту.
+        """
+        chat = str(chat_id)
+        bucket = self._chat_bucket(chat)
+        self._pending[chat] += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire(cost)
+                await self._global.acquire(cost)
+                try:
+                    result = await method(chat_id=chat_id, **kwargs)
+                except RetryAfter as e:
+                    self.rate_limited += 1
+                    if attempt == self.max_retries:
+                        raise
+                    bucket.block(_retry_after_seconds(e))
+                    continue
+                self.sent += cost
+                return result
+        finally:
+            self._pending[chat] -= 1
+            if not self._pending[chat]:
+                del self._pending[chat]
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(self._pending.values()),
+            "per_chat": dict(self._pending),
+            "sent": self.sent,
+            "rate_limited": self.rate_limited,
+        }
+
+
+tg_scheduler = TelegramScheduler()
@@ -0,0 +1,318 @@
+# app/core/uploads.py
+#
+# Потоковый разбор multipart для приёма заказов.
+# Тело читаем по кускам из request.stream(), каждую файловую часть сразу пишем
+# на диск (во временную папку заказа), лимиты проверяем по мере поступления байтов —
+# слишком большой запрос получает 413 до того, как осядет в памяти.
+import asyncio
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+import aiofiles
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", ".cache/incoming")
+
+# буфер записи одной части: меньше переключений в тредпул aiofiles
+WRITE_BUFFER = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class UploadLimits:
+    max_file_bytes: int = int(os.getenv("ORDER_MAX_FILE_BYTES", str(20 * 1024 * 1024)))
+    max_request_bytes: int = int(os.getenv("ORDER_MAX_REQUEST_BYTES", str(60 * 1024 * 1024)))
+    max_files: int = int(os.getenv("ORDER_MAX_FILES", "11"))  # design + 10 фото
+    max_field_bytes: int = 64 * 1024
+    max_fields: int = 50
+
+
+@dataclass
+class StoredPart:
+    field: str
+    filename: str
+    path: str
+    size: int
+    content_type: str
+    sha256: str
+
+
+@dataclass
+class StreamedForm:
+    tmp_dir: str
+    fields: dict[str, str] = field(default_factory=dict)
+    files: dict[str, list[StoredPart]] = field(default_factory=dict)
+
+    def get(self, name: str, default: str = "") -> str:
+        return self.fields.get(name, default)
+
+    def file(self, name: str) -> StoredPart | None:
+        parts = self.files.get(name)
+        return parts[0] if parts else None
+
+    def file_list(self, name: str) -> list[StoredPart]:
+        return self.files.get(name, [])
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
+
+
+class _PartWriter:
+    def __init__(self, form: StreamedForm, limits: UploadLimits):
+        self.form = form
+        self.limits = limits
+        self.files_count = 0
+        self.fields_count = 0
+
+        # состояние текущей части
+        self.name = ""
+        self.filename: str | None = None
+        self.content_type = ""
+        self.size = 0
+        self.buf = bytearray()
+        self.out = None
+        self.path = ""
+        self.hasher = None
+
+    async def begin(self, headers: dict[bytes, bytes]) -> None:
+        _, opts = parse_options_header(headers.get(b"content-disposition", b""))
+        self.name = opts.get(b"name", b"").decode("utf-8", "replace")
+        raw_filename = opts.get(b"filename")
+        self.filename = None if raw_filename is None else os.path.basename(raw_filename.decode("utf-8", "replace"))
+        self.content_type = headers.get(b"content-type", b"").decode("latin-1")
+        self.size = 0
+        self.buf.clear()
+
+        if self.filename is None:
+            self.fields_count += 1
+            if self.fields_count > self.limits.max_fields:
+                raise HTTPException(status_code=400, detail="Too many form fields")
+            return
+
+        self.files_count += 1
+        if self.files_count > self.limits.max_files:
+            raise _too_large("Too many files")
+        self.path = os.path.join(self.form.tmp_dir, f"part_{self.files_count}")
+        # хэш считаем по ходу записи — хранилищу блобов не нужно перечитывать файл
+        self.hasher = hashlib.sha256()
+        self.out = await aiofiles.open(self.path, "wb")
+
+    async def data(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.filename is None:
+            if self.size > self.limits.max_field_bytes:
+                raise _too_large(f"Field {self.name!r} is too large")
+            self.buf += chunk
+            return
+
+        if self.size > self.limits.max_file_bytes:
+            raise _too_large(f"File {self.filename!r} is too large")
+        self.buf += chunk
+        if len(self.buf) >= WRITE_BUFFER:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        data = bytes(self.buf)
+        self.buf.clear()
+        self.hasher.update(data)
+        await self.out.write(data)
+
+    async def end(self) -> None:
+        if self.filename is None:
+            self.form.fields[self.name] = self.buf.decode("utf-8", "replace")
+            self.buf.clear()
+            return
+
+        if self.buf:
+            await self._flush()
+        await self.out.close()
+        self.out = None
+
+        self.form.files.setdefault(self.name, []).append(StoredPart(
+            field=self.name,
+            filename=self.filename,
+            path=self.path,
+            size=self.size,
+            content_type=self.content_type,
+            sha256=self.hasher.hexdigest(),
+        ))
+
+    async def abort(self) -> None:
+        if self.out is not None:
+            await self.out.close()
+            self.out = None
+
+
+def _copy_fd(src_fd: int, dst_fd: int, size: int) -> None:
+    # копирование внутри ядра: copy_file_range (reflink/серверная копия, где умеет ФС),
+    # иначе sendfile; байты не проходят через Python
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied)
+                if n == 0:
+                    break
+                copied += n
+            return
+        except OSError as e:
+            # старые ядра не умеют между разными ФС — пробуем sendfile с того же места
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    while copied < size:
+        n = os.sendfile(dst_fd, src_fd, copied, size - copied)
+        if n == 0:
+            break
+        copied += n
+
+
+def persist_file(src: str, dst: str) -> bool:
+    """
+    Переносит принятый файл на постоянное место без копирования в юзерспейсе:
+    hard link на той же ФС, иначе копия в ядре. Существующий dst не перезаписывается
+    (для хранилища по содержимому это тот же файл). True — dst создан этим вызовом.
+    """
+    try:
+        os.link(src, dst)
+        created = True
+    except FileExistsError:
+        created = False
+        # блоб снова в деле — архив (app/core/archive.py) его пока не трогает
+        try:
+            os.utime(dst)
+        except FileNotFoundError:
+            pass
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+            raise
+        created = _copy_into(src, dst)
+    os.unlink(src)
+    return created
+
+
+def _copy_into(src: str, dst: str) -> bool:
+    # пишем во временный файл рядом и публикуем link-ом: никто не увидит половину файла
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            _copy_fd(fin.fileno(), fout.fileno(), os.fstat(fin.fileno()).st_size)
+        os.link(tmp, dst)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+
+
+async def persist_upload(part: StoredPart, dst: str) -> bool:
+    """persist_file + создание каталога — одним переходом в тредпул на файл."""
+    def run() -> bool:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        return persist_file(part.path, dst)
+
+    return await asyncio.to_thread(run)
+
+
+async def parse_multipart_stream(request: Request, limits: UploadLimits | None = None) -> StreamedForm:
+    """
+    Разбирает multipart/form-data потоково. Файлы лежат в form.tmp_dir,
+    вызывающий код переносит их куда нужно и в конце зовёт form.cleanup().
+    """
+    limits = limits or UploadLimits()
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    # честный Content-Length отсекаем сразу, до чтения тела
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limits.max_request_bytes:
+        raise _too_large("Request body is too large")
+
+    form = StreamedForm(tmp_dir=os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex))
+    os.makedirs(form.tmp_dir, exist_ok=True)
+    writer = _PartWriter(form, limits)
+
+    # парсер синхронный: колбэки копят события, асинхронно обрабатываем их после каждого куска
+    events: list[tuple[str, object]] = []
+    headers: dict[bytes, bytes] = {}
+    header = [b"", b""]
+
+    def on_part_begin() -> None:
+        headers.clear()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header[0] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header[1] += data[start:end]
+
+    def on_header_end() -> None:
+        headers[header[0].lower()] = header[1]
+        header[0] = header[1] = b""
+
+    def on_headers_finished() -> None:
+        events.append(("begin", dict(headers)))
+
+    callbacks = {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+        # закрывающий boundary дошёл
+        "on_end": lambda: events.append(("finished", None)),
+    }
+    parser = MultipartParser(boundary, callbacks)
+
+    received = 0
+    finished = False
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > limits.max_request_bytes:
+                raise _too_large("Request body is too large")
+
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "begin":
+                    await writer.begin(data)
+                elif kind == "data":
+                    await writer.data(data)
+                elif kind == "end":
+                    await writer.end()
+                else:
+                    finished = True
+            events.clear()
+
+        parser.finalize()
+        # тело оборвалось до закрывающего boundary: finalize() молчит, а последняя
+        # часть так и не закрыта — не принимаем обрезанную форму
+        if not finished:
+            raise MultipartParseError("Body ended before the closing boundary")
+    except MultipartParseError:
+        await writer.abort()
+        form.cleanup()
+        raise HTTPException(status_code=400, detail="Malformed multipart body")
+    except BaseException:
+        await writer.abort()
+        form.cleanup()
+        raise
+
+    return form
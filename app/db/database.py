@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession, AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import DateTime, func, Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import DateTime, func, Column, Integer, String, Boolean, ForeignKey, Index, text, JSON, Text
 from dotenv import load_dotenv
 
 
@@ -93,6 +93,130 @@ class Designs(Base):
         server_default=func.now()
     )
 
+class Outbox(Base):
+    """Исходящие уведомления: пишутся в одной транзакции с заказом, отправляются воркерами."""
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    kind: Mapped[str] = mapped_column(String(30), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+    # pending | processing | done | dead
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+    # аренда строки воркером; протухла — воркер упал, строку можно забрать снова
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # шаги обработчика, уже сделанные в прошлых попытках (фото, альбом k, ...)
+    progress: Mapped[list | None] = mapped_column(JSON, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+
+class TgFileId(Base):
+    """file_id, который Telegram вернул при первой загрузке файла с таким содержимым."""
+    __tablename__ = "tg_file_ids"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # photo | document — file_id одного типа нельзя отправить как другой
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True)
+    file_id: Mapped[str] = mapped_column(String(255), nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+
+class Blob(Base):
+    """Файл загрузки в хранилище по содержимому (uploads/blobs/ab/cd/<sha256><ext>)."""
+    __tablename__ = "blobs"
+
+    # <sha256><ext>: расширение — часть ключа, /uploads отдаёт тип по нему
+    key: Mapped[str] = mapped_column(String(80), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+
+class OrderFile(Base):
+    """Манифест заказа: какие блобы к нему относятся и под какими исходными именами."""
+    __tablename__ = "order_files"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    blob_key: Mapped[str] = mapped_column(ForeignKey("blobs.key"), nullable=False)
+    # маленькое WEBP-превью для админки (тоже блоб)
+    preview_key: Mapped[str | None] = mapped_column(ForeignKey("blobs.key"), nullable=True)
+
+    # design | attachment
+    role: Mapped[str] = mapped_column(String(20), nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+class ArchivedFile(Base):
+    """Старый файл из uploads/, упакованный в zstd-бандл (app/core/archive.py)."""
+    __tablename__ = "archived_files"
+
+    # путь относительно uploads/, как в URL: blobs/ab/cd/<key> или <папка заказа>/design.png
+    path: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # имя файла бандла; смещения — в индексе внутри самого бандла
+    bundle: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now()
+    )
+
+# индексы под горячие запросы (миграция 4f2c8e1d9a7b), здесь — чтобы autogenerate их не терял
+Index(
+    "ix_designs_active_created",
+    Designs.created_at.desc(), Designs.id.desc(),
+    postgresql_where=text("is_active"),
+)
+Index(
+    "ix_designs_active_cat_brand_created",
+    Designs.category, Designs.brand, Designs.created_at.desc(), Designs.id.desc(),
+    postgresql_where=text("is_active"),
+)
+Index("ix_designs_created_id", Designs.created_at.desc(), Designs.id.desc())
+Index("ix_orders_order_date_id", Order.order_date, Order.id)
+Index(
+    "ix_orders_ready_date_design",
+    Order.order_date, Order.design_id,
+    postgresql_where=text("order_kind = 'ready' AND design_id IS NOT NULL"),
+)
+Index("ix_orders_design_id", Order.design_id)
+Index("ix_order_files_order_id", OrderFile.order_id)
+# у заказа один design: сцену могут растеризовать два воркера сразу (app/core/scene.py)
+Index(
+    "ux_order_files_design",
+    OrderFile.order_id,
+    unique=True,
+    postgresql_where=text("role = 'design'"),
+    sqlite_where=text("role = 'design'"),
+)
+Index(
+    "ix_outbox_due",
+    Outbox.available_at, Outbox.id,
+    postgresql_where=text("status IN ('pending', 'processing')"),
+)
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
         yield session
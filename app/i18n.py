@@ -1,9 +1,22 @@
+import gzip
+import hashlib
 import json
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict
 
 from fastapi import Request
 from jinja2 import pass_context
+from jinja2.ext import Extension
+from jinja2.lexer import Token, TokenStream
+
+try:
+    import brotli
+except ImportError:  # br — опционально, gzip есть всегда
+    brotli = None
 
 DEFAULT_LANG = "ro"
 SUPPORTED_LANGS = {"ro", "ru"}
@@ -41,16 +54,134 @@ def get_lang(request: Request) -> str:
     return DEFAULT_LANG
 
 
-def build_i18n_payload(lang: str, locales_dir: str = "app/locales") -> Dict[str, Any]:
-    return {"lang": lang, "dict": _load_lang(lang, locales_dir=locales_dir)}
+# какие ключи нужны фронту: __t('...') в модулях app/static/js (и в inline-скриптах шаблонов)
+JS_SOURCES = ("app/static/js", "app/templates")
+_JS_CALL_RE = re.compile(r"__t\(")
+_JS_KEY_RE = re.compile(r"""__t\(\s*(['"])([^'"]+)\1\s*\)""")
+
+
+@lru_cache(maxsize=1)
+def js_keys(sources=JS_SOURCES) -> frozenset[str] | None:
+    """Ключи из литеральных вызовов __t('...'). None — есть __t(переменная), нужен весь словарь."""
+    keys = set()
+    for src in sources:
+        for path in Path(src).rglob("*"):
+            if path.suffix not in (".js", ".html") or "dist" in path.parts:
+                continue
+            text = path.read_text(encoding="utf-8")
+            found = _JS_KEY_RE.findall(text)
+            if len(found) != len(_JS_CALL_RE.findall(text)):
+                logging.info(f"i18n: dynamic __t() in {path}, shipping full dictionary")
+                return None
+            keys.update(key for _, key in found)
+    return frozenset(keys)
+
+
+@dataclass(frozen=True)
+class I18nScript:
+    lang: str
+    version: str
+    body: bytes
+    gzip: bytes
+    br: bytes | None
+
+    @property
+    def url(self) -> str:
+        return f"/i18n/{self.lang}.{self.version}.js"
+
+
+_SCRIPTS: Dict[str, I18nScript] = {}
+
+
+def i18n_script(lang: str, locales_dir: str = "app/locales") -> I18nScript:
+    """
+    Словарь для JS как отдельный скрипт: собирается один раз на язык, версия — хэш содержимого
+    (поменялся ro.json — поменялся URL). В словаре только ключи, которые JS реально использует.
+    """
+    lang = lang if lang in SUPPORTED_LANGS else DEFAULT_LANG
+    script = _SCRIPTS.get(lang)
+    if script is not None:
+        return script
+
+    keys = js_keys()
+    d = _load_lang(lang, locales_dir=locales_dir)
+    if keys is not None:
+        d = {k: v for k, v in d.items() if k in keys}
+
+    payload = json.dumps({"lang": lang, "dict": d}, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    body = (
+        f"window.__I18N={payload};\n"
+        "window.__t=(k)=>(window.__I18N&&window.__I18N.dict&&window.__I18N.dict[k])?window.__I18N.dict[k]:k;\n"
+    ).encode("utf-8")
+    script = _SCRIPTS[lang] = I18nScript(
+        lang=lang,
+        version=hashlib.sha256(body).hexdigest()[:12],
+        body=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=11) if brotli else None,
+    )
+    return script
+
+
+def i18n_script_url(lang: str) -> str:
+    return i18n_script(lang).url
+
+
+def reload_locales() -> None:
+    """Словари поменялись на диске — сбросить всё, что из них собрано."""
+    _CACHE.clear()
+    _SCRIPTS.clear()
+    js_keys.cache_clear()
+
+
+class CompiledTranslations(Extension):
+    """
+    t('литерал') подставляется при компиляции шаблона: у каждого языка своё окружение
+    (env.i18n_lang), перевод попадает в скомпилированный код строкой.
+    t(переменная) остаётся вызовом глобала t — на рендере, как раньше.
+    """
+
+    def filter_stream(self, stream: TokenStream):
+        d = _load_lang(self.environment.i18n_lang, locales_dir=self.environment.i18n_locales_dir)
+        tokens = list(stream)
+        prev = None
+        i = 0
+        while i < len(tokens):
+            tok = tokens[i]
+            if (
+                tok.type == "name" and tok.value == "t"
+                and (prev is None or prev.type != "dot")  # obj.t('x') не трогаем
+                and [x.type for x in tokens[i + 1:i + 4]] == ["lparen", "string", "rparen"]
+            ):
+                key = tokens[i + 2].value
+                prev = Token(tok.lineno, "string", d.get(key, key))
+                yield prev
+                i += 4
+                continue
+            yield tok
+            prev = tok
+            i += 1
+
 
+def install_jinja_i18n(templates, locales_dir: str = "app/locales", lang: str | None = None):
+    """
+    lang задан — окружение этого языка: литеральные ключи переводит CompiledTranslations.
+    Без lang — только рантайм-глобал t (язык из контекста).
+    """
+    env = templates.env
+    if lang is not None:
+        env.i18n_lang = lang
+        env.i18n_locales_dir = locales_dir
+        env.add_extension(CompiledTranslations)
 
-def install_jinja_i18n(templates, locales_dir: str = "app/locales"):
     @pass_context
     def t(ctx, key: str) -> str:
         req: Request = ctx.get("request")
-        lang = ctx.get("lang") or (getattr(req.state, "lang", None) if req else None) or DEFAULT_LANG
+        lang = (
+            ctx.get("lang") or (getattr(req.state, "lang", None) if req else None)
+            or getattr(ctx.environment, "i18n_lang", None) or DEFAULT_LANG
+        )
         d = _load_lang(lang, locales_dir=locales_dir)
         return d.get(key, key)
 
-    templates.env.globals["t"] = t
\ No newline at end of file
+    env.globals["t"] = t
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import logging
 
@@ -9,8 +10,8 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, APIRouter
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 
+from sqlalchemy import text
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.tg_bot.bot_init import tg_bot
@@ -18,7 +19,16 @@ from app.tg_bot.db.database import DbSessionMiddleware
 from app.tg_bot.handler import order, delete, start, info
 
 from app.admin.router import router as admin_router
-from app.routers import termos, huse_personalizate, designs, orders_ready, router_i18n
+from app.routers import termos, huse_personalizate, designs, orders_ready, router_i18n, images, uploads
+from app.core.images import resizer
+from app.core.outbox import outbox_workers
+from app.core.resumable import gc_loop as resumable_gc_loop
+from app.core.archive import ArchiveStaticFiles, archive_loop
+from app.core.blobs import gc_loop as blob_gc_loop
+from app.core.templates import warm_up as warm_up_templates
+from app.core.prerender import prerender_all, prerender_loop
+from app.db.database import engine
+from app.core.assets import PrecompressedStaticFiles
 
 from fastapi import FastAPI
 
@@ -47,17 +57,39 @@ dp.include_router(info.info_router)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # прогрев до готовности воркера: шаблоны (байткод с диска или компиляция), словари, пул БД
+    await asyncio.to_thread(warm_up_templates)
+    # маркетинговые страницы — готовыми байтами на каждый язык
+    await asyncio.to_thread(prerender_all, app)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
     await tg_bot.set_webhook(WEBHOOK_URL)
     logging.info("✅ Webhook установлен")
+    outbox_workers.start()
+    # брошенные докачиваемые загрузки
+    gc_task = asyncio.create_task(resumable_gc_loop())
+    # старые загрузки -> zstd-бандлы (раз в сутки)
+    archive_task = asyncio.create_task(archive_loop())
+    # блобы, на которые не ссылается ни один заказ, и файлы без строки в БД
+    blob_gc_task = asyncio.create_task(blob_gc_loop())
+    # правка шаблонов/словарей на диске -> пересборка предрендера
+    prerender_task = asyncio.create_task(prerender_loop(app))
     yield
+    prerender_task.cancel()
+    gc_task.cancel()
+    archive_task.cancel()
+    blob_gc_task.cancel()
+    await outbox_workers.stop()
     await tg_bot.delete_webhook()
     logging.info("🧹 Webhook удалён")
+    resizer.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
-templates = Jinja2Templates(directory="app/templates")
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# dist/ — файлы с отпечатком (python -m app.core.assets): immutable + готовые .br/.gz
+app.mount("/static", PrecompressedStaticFiles(directory="app/static"), name="static")
+# старые файлы заказов лежат в бандлах архива — отдаются оттуда же прозрачно
+app.mount("/uploads", ArchiveStaticFiles(directory="uploads"), name="uploads")
 
 app.state.limiter = limiter # noqa
 # Добавляем обработчик ошибки "Too Many Requests" (429)
@@ -78,6 +110,8 @@ app.include_router(pages_router)
 app.include_router(designs.router)
 app.include_router(orders_ready.router)
 app.include_router(router_i18n.router)
+app.include_router(images.router)
+app.include_router(uploads.router)
 
 # --- WEBHOOK ---
 webhook_router = APIRouter()
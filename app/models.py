@@ -1,5 +1,6 @@
 from fastapi import Form
-from pydantic import BaseModel, Field
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError
 
 
 class OrderModel(BaseModel):
@@ -14,4 +15,14 @@ class OrderModel(BaseModel):
             address: str = Form(""),
             phone: str = Form(...)
     ):
-        return cls(name=name, address=address, phone=phone)
\ No newline at end of file
+        return cls(name=name, address=address, phone=phone)
+
+    @classmethod
+    def from_fields(cls, fields: dict[str, str]):
+        # для потокового разбора формы (app/core/uploads.py): та же 422, что и у Form(...)
+        data = {k: fields[k] for k in ("name", "phone") if k in fields}
+        data["address"] = fields.get("address", "")
+        try:
+            return cls(**data)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
@@ -1,12 +1,12 @@
 # routers/designs.py
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
 
-from app.db.database import get_async_session, Designs
+from app.core.catalog import get_catalog, CATALOG_PAGE_SIZE, CATALOG_MAX_PAGE_SIZE
+from app.core.pagination import decode_cursor
+from app.core.images import img_url, img_srcset
 from app.core.templates import templates
-from app.core.render import render
+from app.core.render import render_cached
 
 router = APIRouter()
 
@@ -15,80 +15,100 @@ async def designs_list(
     request: Request,
     category: str | None = None,
     brand: str | None = None,
-    session: AsyncSession = Depends(get_async_session),
+    cursor: str | None = None,
 ):
+    # весь каталог берём из in-memory снимка — в БД не ходим
+    catalog = await get_catalog()
+
     # ---------- categories (всегда) ----------
-    cats_stmt = (
-        select(Designs.category)
-        .where(
-            Designs.is_active == True,
-            Designs.category.is_not(None),
-        )
-        .distinct()
-        .order_by(Designs.category)
-    )
-    categories = [c for c in (await session.execute(cats_stmt)).scalars().all() if c]
+    categories = list(catalog.categories)
 
     # ---------- brands (только когда выбрана категория) ----------
-    brands: list[str] = []
-    active_brand: str | None = None
+    brands: list[str] = list(catalog.brands_for(category))
 
-    if category:
-        brands_stmt = (
-            select(Designs.brand)
-            .where(
-                Designs.is_active == True,
-                Designs.category == category,
-                Designs.brand.is_not(None),
-            )
-            .distinct()
-            .order_by(Designs.brand)
-        )
-        brands = [b for b in (await session.execute(brands_stmt)).scalars().all() if b]
+    # счётчики для чипов — считаются при сборке снимка, запросов не добавляют
+    category_counts = dict(catalog.category_counts)
+    brand_counts = {b: catalog.brand_counts[(category, b)] for b in brands}
+    active_brand: str | None = None
 
-        # если прилетел brand, но он не существует в рамках этой category — сбросим
-        if brand and brand in brands:
-            active_brand = brand
+    # если прилетел brand, но он не существует в рамках этой category — сбросим
+    if category and brand and brand in brands:
+        active_brand = brand
 
     # ---------- designs list ----------
-    stmt = select(Designs).where(Designs.is_active == True)
-
-    if category:
-        stmt = stmt.where(Designs.category == category)
-
-        # бренд фильтруем только если он валидный для этой категории
-        if active_brand:
-            stmt = stmt.where(Designs.brand == active_brand)
-
-    stmt = stmt.order_by(Designs.created_at.desc(), Designs.id.desc())
-    items = (await session.execute(stmt)).scalars().all()
-
-    return render(
+    # бренд фильтруем только если он валидный для этой категории.
+    # Рендерим только первую страницу, остальное догружает designs_list.js через /api/designs
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        after = None
+    items, next_cursor = catalog.page(category, active_brand, after, CATALOG_PAGE_SIZE)
+
+    return render_cached(
         request,
         "designs_list.html",
         {
             "items": items,
             "categories": categories,
             "brands": brands,
+            "category_counts": category_counts,
+            "brand_counts": brand_counts,
+            "total_count": len(catalog.items),
             "active_category": category,
             "active_brand": active_brand,
+            "next_cursor": next_cursor,
         },
+        key=(category, active_brand, cursor if after else None),
+        version=catalog.version,
+        # сетка товаров большая: <head> и шапка уходят, пока она рендерится
+        stream=True,
     )
 
 
+@router.get("/api/designs")
+async def designs_api(
+    category: str | None = None,
+    brand: str | None = None,
+    cursor: str | None = None,
+    limit: int = CATALOG_PAGE_SIZE,
+):
+    catalog = await get_catalog()
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if brand and brand not in catalog.brands_for(category):
+        brand = None
+
+    limit = min(max(limit, 1), CATALOG_MAX_PAGE_SIZE)
+    items, next_cursor = catalog.page(category, brand, after, limit)
+
+    return {
+        "items": [
+            {
+                "id": i.id,
+                "slug": i.slug,
+                "title": i.title,
+                "image_url": img_url(i.image_url, 480),
+                "srcset": img_srcset(i.image_url),
+                "price_mdl": i.price_mdl,
+                "category": i.category,
+                "brand": i.brand,
+            }
+            for i in items
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
 @router.get("/designuri/{slug}", response_class=HTMLResponse)
 async def design_detail(
     request: Request,
     slug: str,
-    session: AsyncSession = Depends(get_async_session),
 ):
-    stmt = select(Designs).where(
-        Designs.slug == slug,
-        Designs.is_active == True,
-    )
-
-    result = await session.execute(stmt)
-    design = result.scalar_one_or_none()
+    catalog = await get_catalog()
+    design = catalog.by_slug.get(slug)
 
     if not design:
         return templates.TemplateResponse(
@@ -97,10 +117,13 @@ async def design_detail(
             status_code=404,
         )
 
-    return render(
+    return render_cached(
         request,
         "design_detail.html",
         {
             "design": design,
         },
+        # ?ok=1 после заказа добавляет на страницу пиксель Purchase
+        key=(slug, request.query_params.get("ok") == "1"),
+        version=catalog.version,
     )
@@ -0,0 +1,36 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from app.core.images import resizer, format_supported, source_version, IMG_FORMATS, IMG_WIDTHS
+from app.core.page_cache import etag_matches
+
+router = APIRouter()
+
+
+@router.get("/img/{width}/{fmt}/{path:path}", include_in_schema=False)
+async def resized_image(request: Request, width: int, fmt: str, path: str, v: str | None = None):
+    if width not in IMG_WIDTHS or fmt not in IMG_FORMATS or not format_supported(fmt):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    try:
+        cached = await resizer.get(path, width, fmt)
+    except Exception as e:
+        logging.error(f"Image resize error ({path}, {width}, {fmt}): {e}")
+        raise HTTPException(status_code=500, detail="Image processing failed")
+
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    # версия в URL совпала — адрес не изменится, кэшируем навсегда; иначе (старая ссылка,
+    # без ?v) — только с перепроверкой по ETag, чтобы замена исходника дошла до браузера
+    immutable = v is not None and v == source_version(path)
+    headers = {
+        # имя файла в кэше — хэш исходника и параметров; mtime не годится, хиты его трогают
+        "ETag": f'"{cached.stem[:32]}"',
+        "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(cached, media_type=IMG_FORMATS[fmt][1], headers=headers)
@@ -3,13 +3,21 @@ import logging
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.bot import send_order_to_telegram
-from app.db.database import get_async_session, Order, Designs
+from app.core.intake import IntakeTimer, OrderDraft, submit_order
+from app.core.catalog import get_catalog
+from app.core.images import ImageResizer
+from app.db.database import get_async_session, Order
 
 router = APIRouter()
 
+def catalog_image_path(image_url: str) -> str | None:
+    if not image_url or not image_url.startswith("/static/"):
+        return None
+    src = ImageResizer.resolve_source(image_url[len("/static/"):])
+    return str(src) if src else None
+
+
 def make_abs_url(request: Request, path: str) -> str:
     if not path:
         return ""
@@ -33,9 +41,8 @@ async def create_ready_order(
 
     session: AsyncSession = Depends(get_async_session),
 ):
-    # 1) проверяем дизайн
-    stmt = select(Designs).where(Designs.id == design_id, Designs.is_active == True)
-    design = (await session.execute(stmt)).scalar_one_or_none()
+    # 1) проверяем дизайн (по снимку каталога, там только активные)
+    design = (await get_catalog()).by_id.get(design_id)
     if not design:
         raise HTTPException(status_code=404, detail="Design not found")
 
@@ -46,27 +53,26 @@ async def create_ready_order(
     if personal_text and len(personal_text) > 30:
         personal_text = personal_text[:30]
 
-    # 3) создаём заказ
-    new_order = Order(
-        c_name=name.strip(),
-        phone_number=phone.strip(),
-        address=address.strip(),
-        brand=brand.strip(),
-        phone_model=phone_model.strip(),
-
-        order_kind="ready",
-        design_id=design.id,
-        personal_text=personal_text,
-
-        status="pending",
-        design_url=None,
-    )
-    session.add(new_order)
-    await session.commit()
-    design_url = make_abs_url(request, design.image_url)
-    try:
-        await send_order_to_telegram(
-            {
+    # 3) создаём заказ (файлов нет — только общий хвост приёма: БД + outbox)
+    timer = IntakeTimer("ready")
+    with timer.stage("db"):
+        await submit_order(session, OrderDraft(
+            kind="ready",
+            order=Order(
+                c_name=name.strip(),
+                phone_number=phone.strip(),
+                address=address.strip(),
+                brand=brand.strip(),
+                phone_model=phone_model.strip(),
+
+                order_kind="ready",
+                design_id=design.id,
+                personal_text=personal_text,
+
+                status="pending",
+                design_url=None,
+            ),
+            data={
                 "order_type": "ready",
                 "name": name,
                 "phone": phone,
@@ -75,11 +81,12 @@ async def create_ready_order(
                 "address": address,
                 "comment": personal_text,
                 "design_title": design.title,
-                "design_url": design_url,
+                "design_url": make_abs_url(request, design.image_url),
             },
-        )
-    except Exception as e:
-        logging.error(f"Telegram send error: {e}")
+            # картинка каталога: заливается один раз, дальше уходит по file_id
+            design_path=catalog_image_path(design.image_url),
+        ))
+    timer.done()
 
     # 4) редирект обратно на страницу дизайна (или на /, как хочешь)
     return RedirectResponse(url=f"/designuri/{design.slug}?ok=1", status_code=303)
@@ -1,25 +1,15 @@
 from fastapi import APIRouter, Request
-
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import Depends, Request
 from fastapi.responses import HTMLResponse
 
-from app.db.database import get_async_session, Designs
-from app.core.render import render
+from app.core.featured import get_featured
+from app.core.prerender import serve_prerendered, render_slot
 
 router = APIRouter()
 
 @router.get("/", response_class=HTMLResponse, include_in_schema=False)
-async def home(request: Request,
-    session: AsyncSession = Depends(get_async_session),
-):
-    stmt = (
-        select(Designs)
-        # .where(Design.is_active == True)  # если есть такое поле — включи
-        .order_by(func.random())
-        .limit(4)
-    )
-    featured = (await session.execute(stmt)).scalars().all()
-    return  render(request, "index.html", {
-     "featured_designs": featured})
+async def home(request: Request):
+    # выборка из предрасчитанного массива id активных дизайнов, без БД
+    featured = await get_featured(4)
+    # остальная главная предрендерена, рендерим только блок случайных дизайнов
+    return serve_prerendered(request, slot=render_slot(request, "partials/featured_designs.html", {
+        "featured_designs": featured}))
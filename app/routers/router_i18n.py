@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response
 
-from app.i18n import SUPPORTED_LANGS, DEFAULT_LANG
+from app.i18n import SUPPORTED_LANGS, DEFAULT_LANG, i18n_script
+from app.core.assets import IMMUTABLE, accepts_encoding
 
 router = APIRouter()
 
@@ -16,3 +17,22 @@ async def set_lang(lang: str, request: Request, next: str = "/"):
     resp = RedirectResponse(url=next or "/", status_code=302)
     resp.set_cookie("lang", lang, max_age=60 * 60 * 24 * 365, samesite="lax")
     return resp
+
+
+@router.get("/i18n/{lang}.{version}.js", include_in_schema=False)
+async def i18n_js(lang: str, version: str, request: Request):
+    if lang not in SUPPORTED_LANGS:
+        raise HTTPException(status_code=404, detail="Not found")
+    script = i18n_script(lang)
+    headers = {
+        "Vary": "Accept-Encoding",
+        # старая версия (страница из кэша браузера после деплоя) — отдаём текущую, но не кэшируем
+        "Cache-Control": IMMUTABLE if version == script.version else "no-cache",
+    }
+    body = script.body
+    accept = request.headers.get("accept-encoding", "")
+    if script.br is not None and accepts_encoding(accept, "br"):
+        body, headers["Content-Encoding"] = script.br, "br"
+    elif accepts_encoding(accept, "gzip"):
+        body, headers["Content-Encoding"] = script.gzip, "gzip"
+    return Response(body, media_type="text/javascript; charset=utf-8", headers=headers)
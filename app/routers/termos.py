@@ -1,110 +1,64 @@
-import logging
-from datetime import datetime
-import os
-from sqlalchemy.exc import IntegrityError, DataError
-import aiofiles
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from fastapi import FastAPI, Request, Form, UploadFile, File, Depends, HTTPException, APIRouter
+from fastapi import Request, Depends, APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.bot import send_order_to_telegram
 from app.db.database import Order, get_session
 from app.models import OrderModel
-from typing import List
-from app.core.templates import templates
-from app.core.render import render
+from app.core.prerender import serve_prerendered
+from app.core.uploads import StreamedForm
+from app.core.intake import OrderDraft, receive_order_form
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
-
-# Создаем папку при старте скрипта (синхронно ок)
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 @router.get("/termos", response_class=HTMLResponse)
 async def termos_page(request: Request):
-    return render(request,
-                  "termos.html", {})
+    # готовые байты на язык (app/core/prerender.py)
+    return serve_prerendered(request)
 
 
 @router.post("/order-termos")
 async def receive_termos_order(
+    request: Request,
     session: AsyncSession = Depends(get_session),
-    order_data: OrderModel = Depends(OrderModel.as_form),
-    comment: str = Form(""),
-
-    termos_size: str = Form("500"),           # "500" | "750"
-    termos_color: str = Form("black"),        # "black" etc
-    termos_text: str = Form("NUMELE"),
-    termos_font: str = Form("Poppins, sans-serif"),
-    termos_text_color: str = Form("#ffffff"),
-
-    design_image: UploadFile = File(...),
-    files: List[UploadFile] = File(default=[])
 ):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_name = "".join(x for x in (order_data.name or "") if x.isalnum()) or "client"
-    order_folder = f"{safe_name}_{timestamp}"
-    order_dir = os.path.join(UPLOAD_DIR, order_folder)
-    os.makedirs(order_dir, exist_ok=True)
+    # приём общий с чехлами (app/core/intake.py), здесь только поля термоса
+    return await receive_order_form(request, session, _termos_draft)
 
-    # main design png
-    design_path = os.path.join(order_dir, "design.png")
-    async with aiofiles.open(design_path, "wb") as f:
-        content = await design_image.read()
-        await f.write(content)
 
-    design_url = f"/uploads/{order_folder}/design.png"
+def _termos_draft(form: StreamedForm) -> OrderDraft:
+    order_data = OrderModel.from_fields(form.fields)
+    comment = form.get("comment")
 
-    # extra files
-    file_paths = []
-    for idx, file in enumerate(files):
-        if not file.filename:
-            continue
-        path = os.path.join(order_dir, f"user_{idx}_{file.filename}")
-        async with aiofiles.open(path, "wb") as out_file:
-            while chunk := await file.read(1024 * 1024):
-                await out_file.write(chunk)
-        file_paths.append(path)
+    termos_size = form.get("termos_size", "500")           # "500" | "750"
+    termos_color = form.get("termos_color", "black")       # "black" etc
+    termos_text = form.get("termos_text", "NUMELE")
+    termos_font = form.get("termos_font", "Poppins, sans-serif")
+    termos_text_color = form.get("termos_text_color", "#ffffff")
 
     # DB save (без миграций: пишем в ту же таблицу Order)
-    try:
-        new_order = Order(
+    return OrderDraft(
+        kind="termos",
+        order=Order(
             c_name=order_data.name,
             phone_number=order_data.phone,
             address=order_data.address,
 
             brand="termos",
             phone_model=f"{termos_size}_{termos_color}",
-            design_url=design_url
-        )
-        session.add(new_order)
-        await session.commit()
-    except (IntegrityError, DataError) as e:
-        logging.error(f"DB Error (termos): {e}")
-        raise HTTPException(status_code=400, detail="Ошибка сохранения заказа в БД")
-
-    # Telegram
-    try:
-        await send_order_to_telegram(
-            {
-                "order_type": "termos",
-                "name": order_data.name,
-                "phone": order_data.phone,
-                "address": order_data.address,
-                "comment": comment,
-
-                "termos_size": termos_size,
-                "termos_color": termos_color,
-                "termos_text": termos_text,
-                "termos_font": termos_font,
-                "termos_text_color": termos_text_color,
-            },
-            design_path=design_path,
-            file_paths=file_paths
-        )
-    except Exception as e:
-        logging.error(f"Telegram send error (termos): {e}")
-
-    return {"message": "Thermos order received"}
\ No newline at end of file
+        ),
+        data={
+            "order_type": "termos",
+            "name": order_data.name,
+            "phone": order_data.phone,
+            "address": order_data.address,
+            "comment": comment,
+
+            "termos_size": termos_size,
+            "termos_color": termos_color,
+            "termos_text": termos_text,
+            "termos_font": termos_font,
+            "termos_text_color": termos_text_color,
+        },
+        message="Thermos order received",
+    )
@@ -0,0 +1,77 @@
+import base64
+import binascii
+
+from fastapi import APIRouter, Request, HTTPException, Response
+
+from app.core.limiter import limiter
+from app.core.resumable import create_upload, get_upload, append_chunk, delete_upload
+
+# Докачиваемая загрузка фото (tus 1.0, ядро протокола + termination).
+# Готовый id клиент передаёт в /order и /order-termos в поле upload_ids.
+router = APIRouter(prefix="/api/uploads")
+
+TUS_VERSION = "1.0.0"
+TUS_HEADERS = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+
+
+def _metadata(header: str | None) -> dict[str, str]:
+    # Upload-Metadata: "filename ZmlsZS5qcGc=,other dmFs"
+    meta = {}
+    for item in (header or "").split(","):
+        key, _, value = item.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            meta[key] = base64.b64decode(value).decode("utf-8") if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Invalid Upload-Metadata")
+    return meta
+
+
+def _int_header(request: Request, name: str) -> int:
+    try:
+        return int(request.headers[name])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} header is required")
+
+
+@router.options("", include_in_schema=False)
+async def tus_options():
+    return Response(status_code=204, headers={
+        **TUS_HEADERS, "Tus-Version": TUS_VERSION, "Tus-Extension": "creation,termination",
+    })
+
+
+@router.post("")
+@limiter.limit("60/minute")
+async def create(request: Request):
+    length = _int_header(request, "Upload-Length")
+    meta = _metadata(request.headers.get("Upload-Metadata"))
+    upload = await create_upload(length, meta.get("filename", ""))
+    return Response(status_code=201, headers={
+        **TUS_HEADERS, "Location": f"{router.prefix}/{upload.id}", "Upload-Offset": "0",
+    })
+
+
+@router.head("/{upload_id}")
+async def status(upload_id: str):
+    upload = await get_upload(upload_id)
+    return Response(status_code=200, headers={
+        **TUS_HEADERS, "Upload-Offset": str(upload.offset), "Upload-Length": str(upload.length),
+    })
+
+
+@router.patch("/{upload_id}")
+async def patch(upload_id: str, request: Request):
+    if request.headers.get("Content-Type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    offset = _int_header(request, "Upload-Offset")
+    upload = await append_chunk(upload_id, offset, request.stream())
+    return Response(status_code=204, headers={**TUS_HEADERS, "Upload-Offset": str(upload.offset)})
+
+
+@router.delete("/{upload_id}")
+async def terminate(upload_id: str):
+    await get_upload(upload_id)
+    await delete_upload(upload_id)
+    return Response(status_code=204, headers=TUS_HEADERS)
@@ -0,0 +1,93 @@
+// static/js/designs_list.js
+// Догрузка каталога по keyset-курсору из /api/designs (infinite scroll).
+(() => {
+  const grid = document.getElementById('designs-grid');
+  const more = document.getElementById('designs-more');
+  if (!grid || !more || !('IntersectionObserver' in window)) return;
+
+  const category = more.dataset.category || '';
+  const brand = more.dataset.brand || '';
+  const currency = more.dataset.currency || 'MDL';
+  let cursor = more.dataset.nextCursor || '';
+  let loading = false;
+
+  const capitalize = (s) => s ? s.charAt(0).toUpperCase() + s.slice(1) : '';
+
+  // разметка карточки — та же, что в designs_list.html
+  function card(item) {
+    const a = document.createElement('a');
+    a.href = `/designuri/${encodeURIComponent(item.slug)}`;
+    a.className = 'group glass neumorphic rounded-3xl p-5 hover:shadow-2xl transition';
+
+    const imgWrap = document.createElement('div');
+    imgWrap.className = 'aspect-square rounded-2xl overflow-hidden border border-gray-200 dark:border-white/10';
+    const img = document.createElement('img');
+    img.src = item.image_url;
+    if (item.srcset) {
+      img.srcset = item.srcset;
+      img.sizes = '(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw';
+    }
+    img.decoding = 'async';
+    img.alt = item.title;
+    img.loading = 'lazy';
+    img.className = 'w-full h-full object-cover group-hover:scale-105 transition';
+    imgWrap.appendChild(img);
+
+    const info = document.createElement('div');
+    info.className = 'mt-4';
+
+    const h3 = document.createElement('h3');
+    h3.className = 'text-lg font-bold';
+    h3.textContent = item.title;
+
+    const meta = document.createElement('p');
+    meta.className = 'text-sm text-gray-500 mt-1';
+    meta.textContent = capitalize(item.category) + (item.brand ? ` · ${item.brand.toUpperCase()}` : '');
+
+    const price = document.createElement('div');
+    price.className = 'mt-3 font-extrabold text-accent';
+    price.textContent = `${item.price_mdl} ${currency}`;
+
+    info.append(h3, meta, price);
+    a.append(imgWrap, info);
+    return a;
+  }
+
+  async function loadMore() {
+    if (loading || !cursor) return;
+    loading = true;
+
+    const params = new URLSearchParams({ cursor });
+    if (category) params.set('category', category);
+    if (brand) params.set('brand', brand);
+
+    try {
+      const res = await fetch(`/api/designs?${params}`, { headers: { 'Accept': 'application/json' } });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const data = await res.json();
+
+      const frag = document.createDocumentFragment();
+      for (const item of data.items || []) frag.appendChild(card(item));
+      grid.appendChild(frag);
+
+      cursor = data.next_cursor || '';
+    } catch (e) {
+      console.error('designs load error', e);
+      cursor = '';  // оставляем обычную ссылку "ещё" как фолбэк
+      return;
+    } finally {
+      loading = false;
+    }
+
+    if (!cursor) {
+      observer.disconnect();
+      more.remove();
+    }
+  }
+
+  const observer = new IntersectionObserver((entries) => {
+    if (entries.some(e => e.isIntersecting)) loadMore();
+  }, { rootMargin: '600px 0px' });
+
+  observer.observe(more);
+})();
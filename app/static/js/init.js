@@ -303,7 +303,7 @@ export function init() {
         const fileId = Date.now() + Math.random().toString(16).slice(2);
         const isFirstImage = state.uploadedFiles.length === 0;
 
-        state.uploadedFiles.push({ fileId, file });
+        state.uploadedFiles.push({ fileId, file, dataURL: ev.target.result });
 
         if (isFirstImage) {
           addImageToCanvas(canvas, ev.target.result, true);
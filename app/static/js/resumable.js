@@ -0,0 +1,90 @@
+// static/js/resumable.js
+
+/**
+ * Докачиваемая загрузка фото (tus 1.0, сервер — /api/uploads).
+ * Файл уходит кусками; при обрыве спрашиваем HEAD, сколько дошло, и продолжаем
+ * с этого места. id загрузки запоминается в записи uploadedFiles, так что
+ * повторная отправка формы не гонит фото заново.
+ */
+const ENDPOINT = '/api/uploads';
+const CHUNK_SIZE = 1024 * 1024;
+const RETRY_DELAYS = [500, 1500, 3000, 6000, 10000];
+const TUS = { 'Tus-Resumable': '1.0.0' };
+
+const sleep = (ms) => new Promise((r) => setTimeout(r, ms));
+
+async function createUpload(file) {
+  const res = await fetch(ENDPOINT, {
+    method: 'POST',
+    headers: {
+      ...TUS,
+      'Upload-Length': String(file.size),
+      'Upload-Metadata': `filename ${btoa(unescape(encodeURIComponent(file.name || 'photo')))}`,
+    },
+  });
+  if (res.status !== 201) throw new Error(`create upload: ${res.status}`);
+  return res.headers.get('Location').split('/').pop();
+}
+
+// null — загрузки на сервере больше нет (истёк TTL или уже ушла в заказ)
+async function serverOffset(id) {
+  const res = await fetch(`${ENDPOINT}/${id}`, { method: 'HEAD', headers: TUS });
+  if (res.status === 404) return null;
+  if (!res.ok) throw new Error(`upload status: ${res.status}`);
+  return Number(res.headers.get('Upload-Offset'));
+}
+
+async function sendChunk(id, file, offset) {
+  const res = await fetch(`${ENDPOINT}/${id}`, {
+    method: 'PATCH',
+    headers: {
+      ...TUS,
+      'Content-Type': 'application/offset+octet-stream',
+      'Upload-Offset': String(offset),
+    },
+    body: file.slice(offset, offset + CHUNK_SIZE),
+  });
+  if (res.status === 409) return serverOffset(id); // разошлись — берём offset сервера
+  if (res.status !== 204) throw new Error(`upload chunk: ${res.status}`);
+  return Number(res.headers.get('Upload-Offset'));
+}
+
+/** Заливает entry.file, возвращает id готовой загрузки. */
+export async function uploadResumable(entry) {
+  const file = entry.file;
+  let attempt = 0;
+  for (;;) {
+    try {
+      let offset = entry.uploadId ? await serverOffset(entry.uploadId) : null;
+      if (offset === null) {
+        entry.uploadId = await createUpload(file);
+        offset = 0;
+      }
+      while (offset !== null && offset < file.size) {
+        offset = await sendChunk(entry.uploadId, file, offset);
+        attempt = 0; // кусок дошёл — счётчик ретраев заново
+      }
+      if (offset !== null) return entry.uploadId;
+      entry.uploadId = null;
+    } catch (err) {
+      if (attempt >= RETRY_DELAYS.length) throw err;
+      await sleep(RETRY_DELAYS[attempt++]);
+    }
+  }
+}
+
+/**
+ * Фото заказа: по возможности заранее докачкой (в форму идут только id),
+ * иначе — как раньше, файлами в том же multipart. Порядок файлов сохраняется.
+ */
+export async function appendOrderFiles(formData, entries) {
+  if (!entries.length) return;
+  try {
+    const ids = [];
+    for (const entry of entries) ids.push(await uploadResumable(entry));
+    formData.append('upload_ids', ids.join(','));
+  } catch (err) {
+    console.warn('resumable upload failed, sending files inline', err);
+    entries.forEach((i) => formData.append('files', i.file));
+  }
+}
@@ -0,0 +1,45 @@
+// static/js/scene.js
+
+// то же, что отклоняет validate_scene на сервере (app/core/scene.py)
+const TEXT_TYPES = new Set(['text', 'i-text', 'textbox']);
+
+// шрифты, которые есть на сервере (scene_fonts() в шаблоне редактора)
+const fontKey = (family) => (family || '').split(',')[0].toLowerCase().replace(/[^a-z0-9]/g, '');
+const serverFonts = new Set(window.__sceneFonts || []);
+
+function renderable(obj) {
+  if (!obj) return true;
+  if (obj.clipPath || obj.shadow) return false;
+  if (obj.stroke && obj.strokeWidth !== 0) return false;
+  if (TEXT_TYPES.has(obj.type) && (obj.charSpacing || !serverFonts.has(fontKey(obj.fontFamily)))) return false;
+  return true;
+}
+
+/**
+ * Сцена fabric.js для отправки заказа вместо готового PNG.
+ * Фото клиента и так уходят в `files`, поэтому в сцене они заменяются ссылками
+ * "file:N" (N — индекс в state.uploadedFiles). PNG печатного размера рисует сервер.
+ * Возвращает null, если сцену так собрать нельзя (например, фото уже удалили
+ * из миниатюр) или сервер её не нарисует так же — тогда отправляем PNG, как раньше.
+ */
+export function exportScene(canvas, state) {
+  const files = state.uploadedFiles || [];
+
+  const bindSrc = (obj) => {
+    if (!obj || obj.type !== 'image') return true;
+    if (!obj.src || !obj.src.startsWith('data:')) return true; // макет с сайта
+    const idx = files.findIndex((f) => f.dataURL === obj.src);
+    if (idx === -1) return false;
+    obj.src = `file:${idx}`;
+    return true;
+  };
+
+  const scene = canvas.toJSON();
+  const images = [scene.backgroundImage, scene.overlayImage];
+  if (scene.clipPath || !scene.objects.every(renderable) || !images.every(renderable)) return null;
+  if (!scene.objects.every(bindSrc) || !images.every(bindSrc)) return null;
+
+  scene.width = canvas.getWidth();
+  scene.height = canvas.getHeight();
+  return scene;
+}
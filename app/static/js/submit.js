@@ -1,5 +1,8 @@
 // static/js/submit.js
 
+import { exportScene } from './scene.js';
+import { appendOrderFiles } from './resumable.js';
+
 export function setupOrderForm({ DOM, state, canvas, showToast, exportCanvasPng, resetApp }) {
   DOM.cancelOrder.addEventListener('click', () => {
     DOM.orderFormModal.classList.add('hidden');
@@ -25,14 +28,19 @@ export function setupOrderForm({ DOM, state, canvas, showToast, exportCanvasPng,
     formData.append('brand', DOM.brandSelect.value);
     formData.append('model', DOM.modelSelect.value);
 
-    // Экспорт дизайна с overlay уже на канвасе
-    await new Promise((r) => setTimeout(r, 100));
-    const dataURL = await exportCanvasPng(canvas, state, { outWidth: 420 });
-    const blob = await (await fetch(dataURL)).blob();
-    formData.append('design_image', blob, 'design.png');
+    // Дизайн: сцена (несколько КБ, PNG нарисует сервер), если не получилось — PNG с overlay
+    const scene = exportScene(canvas, state);
+    if (scene) {
+      formData.append('design_scene', JSON.stringify(scene));
+    } else {
+      await new Promise((r) => setTimeout(r, 100));
+      const dataURL = await exportCanvasPng(canvas, state, { outWidth: 420 });
+      const blob = await (await fetch(dataURL)).blob();
+      formData.append('design_image', blob, 'design.png');
+    }
 
     // Исходные фото
-    state.uploadedFiles.forEach((i) => formData.append('files', i.file));
+    await appendOrderFiles(formData, state.uploadedFiles);
 
     try {
       const res = await fetch('/order', { method: 'POST', body: formData });
@@ -284,7 +284,7 @@ export async function initThermos() {
       const reader = new FileReader();
       reader.onload = (ev) => {
         const fileId = Date.now() + Math.random().toString(16).slice(2);
-        state.uploadedFiles.push({ fileId, file });
+        state.uploadedFiles.push({ fileId, file, dataURL: ev.target.result });
 
         const wrapper = document.createElement('div');
         wrapper.className =
@@ -1,3 +1,6 @@
+import { exportScene } from '../scene.js';
+import { appendOrderFiles } from '../resumable.js';
+
 export function setupThermosOrderForm({ DOM, state, canvas, showToast, exportCanvasPng, resetApp }) {
   DOM.cancelOrder.addEventListener('click', () => DOM.orderFormModal.classList.add('hidden'));
 
@@ -24,12 +27,18 @@ export function setupThermosOrderForm({ DOM, state, canvas, showToast, exportCan
     formData.append('termos_font', DOM.fontSelector.value || 'Poppins, sans-serif');
     formData.append('termos_text_color', DOM.textColor.value || '#ffffff');
 
-    await new Promise((r) => setTimeout(r, 80));
-    const dataURL = await exportCanvasPng(canvas, state, { outWidth: 420 });
-    const blob = await (await fetch(dataURL)).blob();
-    formData.append('design_image', blob, 'design.png');
+    // сцена вместо PNG (PNG нарисует сервер); не получилось — PNG как раньше
+    const scene = exportScene(canvas, state);
+    if (scene) {
+      formData.append('design_scene', JSON.stringify(scene));
+    } else {
+      await new Promise((r) => setTimeout(r, 80));
+      const dataURL = await exportCanvasPng(canvas, state, { outWidth: 420 });
+      const blob = await (await fetch(dataURL)).blob();
+      formData.append('design_image', blob, 'design.png');
+    }
 
-    state.uploadedFiles.forEach((i) => formData.append('files', i.file));
+    await appendOrderFiles(formData, state.uploadedFiles);
 
     try {
       const res = await fetch('/order-termos', { method: 'POST', body: formData });
@@ -9,7 +9,7 @@ export function bindUploadInput(DOM, state, addToCanvas) {
 
       reader.onload = (ev) => {
         const fileId = Date.now() + Math.random().toString(16).slice(2);
-        state.uploadedFiles.push({ fileId, file });
+        state.uploadedFiles.push({ fileId, file, dataURL: ev.target.result });
 
         const wrapper = document.createElement('div');
         wrapper.className = 'relative aspect-square rounded-xl overflow-hidden shadow-md';